@@ -1,6 +1,6 @@
 # app_excel_azul_naranja.py
 # Bloque AZUL (I2/Q2/A4:B22) intacto + Bloque NARANJA (I8/Q8/R3:S14), NEMA H3:H30.
-# Coincidencia EXACTA para VLOOKUP; si no hay clave exacta => " ".
+# Coincidencia EXACTA para VLOOKUP por defecto; si no hay clave exacta => " ".
 
 """Tkinter application that mirrors the original Excel workbook.
 
@@ -12,180 +12,52 @@ Orange block
     • Input: base HP (I8) and altitude FASL/MASL (Q8).
     • Lookup table: R3:S14 for altitude→load fraction mapping.
 
-NEMA motor sizes are read from H3:H30.  All lookups require an exact
-match; if the key is absent an empty string is shown.
+NEMA motor sizes are read from H3:H30.  By default lookups require an
+exact match; if the key is absent an empty string is shown.  The
+"Búsqueda" selector switches to floor (VLOOKUP TRUE), nearest or linear.
+"Fórmulas del libro" evaluates the sheet's own cell formulas (formulas.py)
+instead of the built-in ones.  With ``CM_TRACE=1`` the load and calculation
+phases are timed (instrument.py) and a "Diagnóstico…" button shows them.
+Every "Calcular" is kept in a columnar ``results.ResultStore``; "Exportar…"
+writes it as CSV, XLSX, Parquet or Arrow.  The "Inverso" panel answers the
+reverse question (largest base HP for a NEMA step and condition) from the
+threshold grid in solver.py; the "Sitio" strip derates I2 for ambient and
+altitude together (engine.compute_site).  The loaded workbook is watched
+(watcher.py): when it is saved, the three ranges are re-read in the
+background and the status bar names the ones that changed.
 """
 
+import queue
+import sys
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from functools import partial
 from pathlib import Path
+from tkinter import ttk, filedialog, messagebox
 
-try:
-    import openpyxl
-except Exception:
-    openpyxl = None
-# --- Helper UI pieces originally from blue_orange_form.py ---
-
-def create_row(parent, heading, fields):
-    """Create a labelled row with one entry per field name."""
-    row = ttk.Frame(parent)
-    row.pack(fill="x", pady=5)
-    ttk.Label(row, text=heading).grid(row=0, column=0, padx=5, sticky="w")
-    for i, field in enumerate(fields):
-        ttk.Label(row, text=field).grid(row=0, column=1 + 2 * i, padx=2, sticky="w")
-        ttk.Entry(row, width=10).grid(row=0, column=2 + 2 * i, padx=2)
-
-
-def build_basic_form(root):
-    """Basic static form with blue/orange blocks; kept for reference."""
-    root.title("Cuadros Azules y Naranjas")
-    main = tk.Frame(root)
-    main.pack(fill="both", expand=True)
-
-    canvas = tk.Canvas(main)
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar = ttk.Scrollbar(main, orient="vertical", command=canvas.yview)
-    scrollbar.pack(side="right", fill="y")
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    content = ttk.Frame(canvas)
-    canvas.create_window((0, 0), window=content, anchor="nw")
-
-    def on_configure(event):
-        canvas.configure(scrollregion=canvas.bbox("all"))
-    content.bind("<Configure>", on_configure)
-
-    style = ttk.Style()
-    style.configure("Blue.TLabelframe", background="#2882c7")
-    style.configure("Blue.TLabelframe.Label", background="#2882c7", foreground="white", font=("Arial", 12, "bold"))
-    style.configure("Orange.TLabelframe", background="#e98300")
-    style.configure("Orange.TLabelframe.Label", background="#e98300", foreground="white", font=("Arial", 12, "bold"))
-
-    blue = ttk.Labelframe(content, text="Cuadros AZULES", style="Blue.TLabelframe", padding=10)
-    blue.pack(fill="x", pady=10)
-    create_row(blue, "Base rating:", ["HP", "kW", "w"])
-    create_row(blue, "50 Hz Rating:", ["Required HP", "NEMA HP"])
-    create_row(blue, "Ambient Temperature:", ["Valor numérico", "Units (°C)"])
-    create_row(blue, "Load %", ["%"])
-    create_row(blue, "New Rating:", ["HP", "kW", "w", "NEMA HP"])
-    create_row(blue, "Tolerancia (EC):", ["Required HP", "NEMA HP"])
-    create_row(blue, "50 Hz Rating (otra sección):", ["Required HP", "NEMA HP"])
-    create_row(blue, "Tolerancia (EC+50):", ["Required HP", "NEMA HP"])
-
-    orange = ttk.Labelframe(content, text="Cuadros NARANJAS", style="Orange.TLabelframe", padding=10)
-    orange.pack(fill="x", pady=10)
-    create_row(orange, "Base rating:", ["HP", "kW", "w"])
-    create_row(orange, "50 Hz Rating:", ["Required HP", "NEMA HP"])
-    create_row(orange, "FASL (MASL):", ["Valor numérico", "Units (ft / m)"])
-    create_row(orange, "Load %", ["%"])
-    create_row(orange, "New Rating:", ["HP", "kW", "w", "NEMA HP"])
-    create_row(orange, "Tolerancia (EC):", ["Required HP", "NEMA HP"])
-    create_row(orange, "50 Hz Rating:", ["Required HP", "NEMA HP"])
-    create_row(orange, "Tolerancia (EC+50):", ["Required HP", "NEMA HP"])
-
-    def on_mousewheel(event):
-        canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-    canvas.bind_all("<MouseWheel>", on_mousewheel)
-
-
-HP_PER_KW = 1.341
-BLANK = " "
+from engine import BLANK, LOOKUP_MODES, PRECISION, ResultCache, fmt
+from excel_tables import DEFAULT_SHEET, EMPTY_TABLES
+from instrument import ENABLED as TRACE, RECORDER, breakdown, count, span
+from livecalc import LiveBlock
+from registry import REGISTRY
+from results import EXPORT_TYPES, ResultStore
+from watcher import WorkbookWatcher
 
 # === Config por defecto (solo precarga; puedes cambiarla en la UI) ===
 DEFAULT_XLSX_PATH = r"C:\Users\MXYAGAR1\Downloads\piton\cm anailisis electrico\PMD NEMA V46 ADAPTED APPLICACION V1.xlsx"
-DEFAULT_SHEET     = "cm electrico"
-
-# Rangos fijos según tu hoja
-# Azul -> A4:B22  (°C -> %)
-A_COL, A_R0, B_COL, B_R1 = "A", 4, "B", 22
-# Naranja -> R3:S14 (FASL/MASL -> %)
-R_COL, R_R0, S_COL, S_R1 = "R", 3, "S", 14
-# NEMA -> H3:H30 (pasos en HP)
-NEMA_COL, NEMA_R0, NEMA_R1 = "H", 3, 30
-
-FALLBACK_NEMA = [1,1.5,2,3,5,7.5,10,15,20,25,30,40,50,60,75,100,125,150,200,250,300,350,400,450,500,600,700,800]
-
-# ---------- utilidades ----------
-def to_kw(hp: float) -> float:
-    return hp / HP_PER_KW
-
-def to_watts(hp: float) -> float:
-    return to_kw(hp) * 1000.0
-
-def fmt(v, nd=2):
-    if v == BLANK or v is None:
-        return BLANK
-    try:
-        s = f"{float(v):.{nd}f}".rstrip("0").rstrip(".")
-        return s
-    except Exception:
-        return str(v)
-
-def pick_nema_hp(x, steps):
-    if x is None or x <= 0:
-        return BLANK
-    for s in steps:
-        try:
-            if x <= float(s):
-                return float(s)
-        except Exception:
-            pass
-    try:
-        top = float(steps[-1])
-        return f">{int(top)} HP"
-    except Exception:
-        return ">800 HP"
-
-def read_two_col_dict(path, sheet, col_key, r0, col_val, r1):
-    """Lee un par de columnas numéricas a dict {key: val}."""
-    if openpyxl is None:
-        raise RuntimeError("Instala openpyxl: pip install openpyxl")
-    p = Path(path)
-    if not p.exists():
-        raise FileNotFoundError(f"No se encontró el archivo: {p}")
-    wb = openpyxl.load_workbook(p, data_only=True, read_only=True)
-    if sheet not in wb.sheetnames:
-        match = [s for s in wb.sheetnames if s.lower() == sheet.lower()]
-        if not match:
-            raise KeyError(f"No existe la hoja '{sheet}'. Hojas: {wb.sheetnames}")
-        sheet = match[0]
-    ws = wb[sheet]
-    out = {}
-    for r in range(r0, r1 + 1):
-        k = ws[f"{col_key}{r}"].value
-        v = ws[f"{col_val}{r}"].value
-        if k is None or v is None:
-            continue
-        try:
-            out[float(k)] = float(v)
-        except Exception:
-            pass
-    wb.close()
-    return out
-
-def read_nema_steps(path, sheet, col="H", r0=3, r1=30):
-    if openpyxl is None:
-        raise RuntimeError("Instala openpyxl: pip install openpyxl")
-    p = Path(path)
-    if not p.exists():
-        raise FileNotFoundError(f"No se encontró el archivo: {p}")
-    wb = openpyxl.load_workbook(p, data_only=True, read_only=True)
-    if sheet not in wb.sheetnames:
-        match = [s for s in wb.sheetnames if s.lower() == sheet.lower()]
-        if not match:
-            raise KeyError(f"No existe la hoja '{sheet}'. Hojas: {wb.sheetnames}")
-        sheet = match[0]
-    ws = wb[sheet]
-    vals = []
-    for r in range(r0, r1 + 1):
-        v = ws[f"{col}{r}"].value
-        try:
-            vals.append(float(v))
-        except Exception:
-            pass
-    wb.close()
-    vals = sorted(set(vals))
-    return vals or FALLBACK_NEMA[:]
+
+# Cálculo en vivo: espera tras la última tecla antes de recalcular
+LIVE_DEBOUNCE_MS = 250
+# Regla del panel "Sitio" -> engine.SITE_RULES
+SITE_RULE_LABELS = {"producto": "product", "peor": "worst"}
+# Recargas del libro vigilado (watcher.py): cada cuánto se revisa la cola en el hilo de Tk
+WATCH_POLL_MS = 500
+
+def _parse_opt(s):
+    """'' -> None; número -> float; cualquier otra cosa -> ValueError."""
+    s = s.strip()
+    return float(s) if s else None
 
 # ---------- app ----------
 class App(tk.Tk):
@@ -195,12 +67,19 @@ class App(tk.Tk):
         self.geometry("1180x840")
         self.resizable(False, False)
 
-        # tablas desde Excel
-        self.tbl_blue   = {}   # A4:B22 (°C -> %)
-        self.tbl_orange = {}   # R3:S14 (FASL/MASL -> %)
-        self.nema_steps = FALLBACK_NEMA[:]
+        # tablas desde Excel (se cargan en segundo plano, ver load_from_excel)
+        self.model = None  # fórmulas de la hoja (formulas.py); solo se leen con "Fórmulas del libro"
+        self._memo = ResultCache(4096)  # resultados por (entradas, versión de tablas); recargar no lo vacía
+        self.results = ResultStore()  # cada "Calcular" queda guardado (results.py); "Limpiar todo" no lo borra
+        self._set_tables(EMPTY_TABLES)
+        self._load_q = None   # cola de la carga vigente; None = sin carga en curso
+        self._src = None      # (libro, hoja) de las tablas en pantalla (None = ninguna cargada)
+        self._watcher = None  # vigila el libro cargado; sus recargas llegan por _watch_q
+        self._watch_job = None  # after() pendiente de _poll_watch (None = sin vigilante)
+        self._watch_q = queue.Queue()
 
         self._build_ui()
+        self._setup_live()
 
         # precarga
         self.var_xlsx.set(DEFAULT_XLSX_PATH)
@@ -232,6 +111,18 @@ class App(tk.Tk):
         self.var_xlsx = tk.StringVar()
         ttk.Entry(top, width=80, textvariable=self.var_xlsx).grid(row=0, column=1, columnspan=3, **pad)
         ttk.Button(top, text="Cambiar…", command=self.pick_excel).grid(row=0, column=4, **pad)
+        mode_box = ttk.Frame(top)
+        mode_box.grid(row=0, column=5, sticky="w", **pad)
+        ttk.Label(mode_box, text="Búsqueda:").pack(side="left")
+        self.var_lookup = tk.StringVar(value="exact")
+        ttk.Combobox(mode_box, width=8, state="readonly", values=LOOKUP_MODES,
+                     textvariable=self.var_lookup).pack(side="left", padx=4)
+        # libros/hojas que siguen en memoria (registry.REGISTRY): cambiar entre ellos es inmediato
+        self.var_recent = tk.StringVar()
+        self.cmb_recent = ttk.Combobox(top, width=22, state="readonly", textvariable=self.var_recent)
+        self.cmb_recent.grid(row=0, column=6, sticky="w", **pad)
+        self.cmb_recent.bind("<<ComboboxSelected>>", lambda e: self.pick_recent())
+        self._recent = []
 
         ttk.Label(top, text="Hoja:").grid(row=1, column=0, sticky="e", **pad)
         self.var_sheet = tk.StringVar()
@@ -240,9 +131,19 @@ class App(tk.Tk):
         ttk.Button(top, text="Cargar tablas", command=self.load_from_excel).grid(row=1, column=2, **pad)
         ttk.Button(top, text="Limpiar todo", command=self.clear_all).grid(row=1, column=3, **pad)
         ttk.Button(top, text="Ver fórmulas", command=self.show_formulas).grid(row=1, column=4, **pad)
+        self.var_nocache = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="Releer (ignorar caché)", variable=self.var_nocache).grid(row=1, column=5, **pad)
+        self.var_live = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="Cálculo en vivo", variable=self.var_live).grid(row=1, column=6, **pad)
 
         self.lbl_status = ttk.Label(top, text="Tablas no cargadas")
-        self.lbl_status.grid(row=2, column=0, columnspan=5, sticky="w", padx=10)
+        self.lbl_status.grid(row=2, column=0, columnspan=4 if TRACE else 5, sticky="w", padx=10)
+        if TRACE:  # CM_TRACE=1: tiempos de carga/cálculo (instrument.py)
+            ttk.Button(top, text="Diagnóstico…", command=self.show_diagnostics).grid(row=2, column=4, **pad)
+        self.btn_cancel = ttk.Button(top, text="Cancelar carga", command=self.cancel_load, state="disabled")
+        self.btn_cancel.grid(row=2, column=5, sticky="w", padx=8)
+        self.var_wbf = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="Fórmulas del libro", variable=self.var_wbf).grid(row=2, column=6, sticky="w", padx=8)
 
         # ===== BLOQUE AZUL (INTACTO) =====
         blue_in = ttk.LabelFrame(self, text="AZUL — Entradas", style="Blue.TLabelframe")
@@ -256,7 +157,8 @@ class App(tk.Tk):
         self.q2_amb = tk.StringVar()
         ttk.Entry(blue_in, width=12, textvariable=self.q2_amb).grid(row=0, column=3, padx=8, pady=6)
 
-        ttk.Button(blue_in, text="Calcular AZUL", command=self.calc_blue).grid(row=0, column=4, padx=8, pady=6)
+        self.btn_blue = ttk.Button(blue_in, text="Calcular AZUL", command=self.calc_blue)
+        self.btn_blue.grid(row=0, column=4, padx=8, pady=6)
 
         blue_out1 = ttk.LabelFrame(self, text="AZUL — Base rating (I2, I3, I4)", style="Blue.TLabelframe")
         blue_out1.place(x=10, y=230, width=360, height=150)
@@ -303,6 +205,25 @@ class App(tk.Tk):
         blue_tol2.place(x=10, y=660, width=360, height=110)
         self.b_ah2 = self._ro(blue_tol2, "Required HP (AH2=AE2*0.94):", 0)
         self.b_ah3 = self._ro(blue_tol2, "NEMA HP (AH3):", 1)
+
+        # ===== SITIO: ambiente (Q2) + altitud (Q8) sobre el HP de I2 =====
+        site = ttk.LabelFrame(self, text="Sitio — ambiente (Q2) + altitud (Q8) sobre I2")
+        site.place(x=10, y=775, width=730, height=55)
+        ttk.Label(site, text="Regla:").grid(row=0, column=0, sticky="e", padx=6, pady=2)
+        self.var_site_rule = tk.StringVar(value="producto")
+        ttk.Combobox(site, width=9, state="readonly", values=tuple(SITE_RULE_LABELS),
+                     textvariable=self.var_site_rule).grid(row=0, column=1, padx=6, pady=2)
+        ttk.Button(site, text="Calcular sitio", command=self.calc_site).grid(row=0, column=2, padx=6, pady=2)
+        self.var_site_out = tk.StringVar(value=BLANK)
+        ttk.Label(site, textvariable=self.var_site_out).grid(row=0, column=3, sticky="w", padx=6, pady=2)
+
+        # ===== RESULTADOS GUARDADOS =====
+        saved = ttk.LabelFrame(self, text="Resultados guardados")
+        saved.place(x=380, y=660, width=360, height=110)
+        self.var_nres = tk.StringVar(value="0 cálculos")
+        ttk.Label(saved, textvariable=self.var_nres).grid(row=0, column=0, columnspan=2, sticky="w", padx=8, pady=6)
+        ttk.Button(saved, text="Exportar…", command=self.export_results).grid(row=1, column=0, padx=8, pady=6)
+        ttk.Button(saved, text="Vaciar", command=self.clear_results).grid(row=1, column=1, padx=8, pady=6)
 
         # ===== BLOQUE NARANJA =====
         orange_in = ttk.LabelFrame(self, text="NARANJA — Entradas", style="Orange.TLabelframe")
@@ -313,7 +234,8 @@ class App(tk.Tk):
         ttk.Label(orange_in, text="FASL/MASL (Q8):").grid(row=0, column=2, sticky="w", padx=8, pady=6)
         self.q8_fasl = tk.StringVar()
         ttk.Entry(orange_in, width=12, textvariable=self.q8_fasl).grid(row=0, column=3, padx=8, pady=6)
-        ttk.Button(orange_in, text="Calcular NARANJA", command=self.calc_orange).grid(row=0, column=4, padx=8, pady=6)
+        self.btn_orange = ttk.Button(orange_in, text="Calcular NARANJA", command=self.calc_orange)
+        self.btn_orange.grid(row=0, column=4, padx=8, pady=6)
 
         orange_base = ttk.LabelFrame(self, text="NARANJA — Base rating (I8,I9,I10) y 50 Hz (L8,L9)", style="Orange.TLabelframe")
         orange_base.place(x=760, y=230, width=410, height=150)
@@ -337,6 +259,46 @@ class App(tk.Tk):
         self.o_ah8  = self._ro(orange_new, "EC+50Hz: AH8=AE8*0.94:", 9)
         self.o_ah9  = self._ro(orange_new, "NEMA(AH8):", 10)
 
+        # ===== INVERSO: HP base máximo por paso NEMA (solver.py) =====
+        inv = ttk.LabelFrame(self, text="Inverso — HP base máx. por paso NEMA")
+        inv.place(x=760, y=700, width=410, height=130)
+        ipad = {"padx": 6, "pady": 3}
+        self.var_inv_block = tk.StringVar(value="AZUL")
+        self.var_inv_stage = tk.StringVar(value="AH")
+        self.var_inv_step = tk.StringVar()
+        self.var_inv_key = tk.StringVar()
+        self.var_inv_out = tk.StringVar(value=BLANK)
+        ttk.Label(inv, text="Bloque:").grid(row=0, column=0, sticky="e", **ipad)
+        ttk.Combobox(inv, width=9, state="readonly", values=("AZUL", "NARANJA"),
+                     textvariable=self.var_inv_block).grid(row=0, column=1, sticky="w", **ipad)
+        ttk.Label(inv, text="Etapa:").grid(row=0, column=2, sticky="e", **ipad)
+        ttk.Combobox(inv, width=6, state="readonly", values=("AH", "AE", "AB", "Y", "L"),
+                     textvariable=self.var_inv_stage).grid(row=0, column=3, sticky="w", **ipad)
+        ttk.Label(inv, text="Paso NEMA:").grid(row=1, column=0, sticky="e", **ipad)
+        self.cmb_inv_step = ttk.Combobox(inv, width=9, state="readonly", textvariable=self.var_inv_step)
+        self.cmb_inv_step.grid(row=1, column=1, sticky="w", **ipad)
+        ttk.Label(inv, text="°C / FASL:").grid(row=1, column=2, sticky="e", **ipad)
+        ttk.Entry(inv, width=8, textvariable=self.var_inv_key).grid(row=1, column=3, sticky="w", **ipad)
+        ttk.Button(inv, text="Resolver", command=self.solve_inverse).grid(row=2, column=0, **ipad)
+        ttk.Label(inv, textvariable=self.var_inv_out).grid(row=2, column=1, columnspan=2, sticky="w", **ipad)
+        ttk.Button(inv, text="Tabla…", command=self.show_grid).grid(row=2, column=3, **ipad)
+
+        # campo del registro (engine) -> StringVar de salida
+        self._blue_out = {
+            "i2": self.b_i2, "i3": self.b_i3, "i4": self.b_i4, "l2": self.b_l2, "l3": self.b_l3,
+            "q2": self.b_q2, "u2": self.b_u2,
+            "y2": self.b_y2, "y2_kw": self.b_y2kw, "y2_w": self.b_y2w, "y2_nema": self.b_y2n,
+            "ab2": self.b_ab2, "ab3": self.b_ab3, "ae2": self.b_ae2, "ae3": self.b_ae3,
+            "ah2": self.b_ah2, "ah3": self.b_ah3,
+        }
+        self._orange_out = {
+            "i8": self.o_i8, "i9": self.o_i9, "i10": self.o_i10, "l8": self.o_l8, "l9": self.o_l9,
+            "u8": self.o_u8,
+            "y8": self.o_y8, "y8_kw": self.o_y8kw, "y8_w": self.o_y8w, "y8_nema": self.o_y8n,
+            "ab8": self.o_ab8, "ab9": self.o_ab9, "ae8": self.o_ae8, "ae9": self.o_ae9,
+            "ah8": self.o_ah8, "ah9": self.o_ah9,
+        }
+
     # ---- Excel ----
     def pick_excel(self):
         path = filedialog.askopenfilename(
@@ -345,21 +307,169 @@ class App(tk.Tk):
         )
         if path:
             self.var_xlsx.set(path)
-
-    def load_from_excel(self, preload=False):
-        try:
+            self.load_from_excel()  # reemplaza cualquier carga en curso
+
+    def _set_tables(self, snap):
+        self.tables     = snap
+        self.tbl_blue   = snap.blue     # A4:B22 (°C -> %)
+        self.tbl_orange = snap.orange   # R3:S14 (FASL/MASL -> %)
+        self.nema_steps = snap.nema     # H3:H30
+        self._refresh_live(tables=snap)
+        # la rejilla inversa se arma al cargar, fuera del evento que trajo las tablas
+        self._grid = None
+        self.after_idle(self._sizing_grid)
+
+    def pick_recent(self):
+        i = self.cmb_recent.current()
+        if 0 <= i < len(self._recent):
+            p, sh = self._recent[i]
+            self.var_xlsx.set(p)
+            self.var_sheet.set(sh)
+            self.load_from_excel()
+
+    def _update_recent(self):
+        self._recent = REGISTRY.recent()
+        self.cmb_recent.config(values=[f"{Path(p).name} · {sh}" for p, sh in self._recent])
+        self.var_recent.set("Recientes…")
+
+    def load_from_excel(self, preload=False, src=None):
+        """Lanza la carga en un hilo; el resultado vuelve al hilo de Tk vía after().
+
+        Si el libro/hoja sigue en el registro en memoria se aplica al instante.
+        Las fórmulas de la hoja solo se leen con "Fórmulas del libro" marcado;
+        ``src`` (libro, hoja) recarga ese libro en vez del de los campos.
+        """
+        t0 = time.perf_counter()
+        if src is None:
             p  = self.var_xlsx.get().strip()
             sh = (self.var_sheet.get().strip() or DEFAULT_SHEET)
-            self.tbl_blue   = read_two_col_dict(p, sh, A_COL, A_R0, B_COL, B_R1)  # A4:B22
-            self.tbl_orange = read_two_col_dict(p, sh, R_COL, R_R0, S_COL, S_R1)  # R3:S14
-            self.nema_steps = read_nema_steps(p, sh, NEMA_COL, NEMA_R0, NEMA_R1)  # H3:H30
-            self.lbl_status.config(text=f"Cargado: A4:B22({len(self.tbl_blue)}), R3:S14({len(self.tbl_orange)}), NEMA({len(self.nema_steps)})")
+        else:
+            p, sh = src
+        nocache = not preload and src is None and self.var_nocache.get()
+        wbf = self.var_wbf.get()
+        if not nocache:
+            snap = REGISTRY.peek(p, sh)
+            model = REGISTRY.peek(p, sh, "formulas") if wbf else None
+            if snap is not None and (model is not None or not wbf):
+                self._load_q = None  # cualquier carga en curso queda huérfana
+                self._set_loading(False)
+                self._apply_load(((snap, "memoria"), model), None, preload, (p, sh), t0)
+                return
+        q = queue.Queue(maxsize=1)
+        self._load_q = q  # una carga nueva deja huérfana a la anterior
+        threading.Thread(target=self._load_worker, args=(q, p, sh, nocache, wbf), daemon=True).start()
+        self._set_loading(True)
+        self._poll_load(q, (p, sh), t0, preload)
+
+    @staticmethod
+    def _load_worker(q, p, sh, nocache, wbf=False):
+        # sin Tk aquí: solo lectura del libro
+        try:
+            if nocache:
+                REGISTRY.discard(p, sh, disk=True)
+            tables = REGISTRY.get(p, sh)  # A4:B22, R3:S14, H3:H30 en una pasada
         except Exception as e:
-            self.tbl_blue, self.tbl_orange = {}, {}
-            self.nema_steps = FALLBACK_NEMA[:]
-            self.lbl_status.config(text=f"No se pudo cargar: {e}")
+            q.put((None, e))
+            return
+        model = None
+        if wbf:  # segunda apertura del libro (con fórmulas): solo si se piden
+            try:
+                model = REGISTRY.get(p, sh, "formulas")[0]
+            except Exception:
+                import formulas  # diferido: se compila en este hilo, no al arrancar
+                model = formulas.default_model()  # sin fórmulas legibles: las predeterminadas
+        q.put(((tables, model), None))
+
+    def _poll_load(self, q, src, t0, preload):
+        if q is not self._load_q:
+            return  # cancelada o reemplazada
+        try:
+            res, err = q.get_nowait()
+        except queue.Empty:
+            self.lbl_status.config(text=f"Cargando {Path(src[0]).name}… {time.perf_counter() - t0:.1f} s")
+            self.after(100, self._poll_load, q, src, t0, preload)
+            return
+        self._load_q = None
+        self._set_loading(False)
+        self._apply_load(res, err, preload, src, t0)
+
+    def _apply_load(self, res, err, preload, src, t0=None):
+        # _src cambia solo aquí: una carga cancelada o fallida no deja apuntando a otro libro
+        if err is None:
+            self._src = src
+            (snap, origin), self.model = res
+            self._set_tables(snap)
+            self._update_recent()
+            how = f" ({origin})" if origin != "libro" else ""
+            status = f"Cargado{how}: A4:B22({len(self.tbl_blue)}), R3:S14({len(self.tbl_orange)}), NEMA({len(self.nema_steps)})"
+            if self.model is not None:
+                warn = f", {len(self.model.warnings)} aviso(s)" if self.model.warnings else ""
+                status += f"; fórmulas: {self.model.source}{warn}"
+            if TRACE and t0 is not None:
+                RECORDER.add("load_from_excel", t0, time.perf_counter(), origen=origin)
+                status += f" — {breakdown(t0)}"
+            self.lbl_status.config(text=status)
+            self._watch(*src)
+        else:
+            if self._watcher is not None:  # sin tablas cargadas no hay nada que vigilar
+                self._watcher.stop()
+                self._watcher = None
+            self._src = None
+            self.model = None
+            self._set_tables(EMPTY_TABLES)
+            self.lbl_status.config(text=f"No se pudo cargar: {err}")
             if not preload:
-                messagebox.showerror("Error", str(e))
+                messagebox.showerror("Error", str(err))
+
+    def _watch(self, p, sh):
+        """Vigila el libro recién cargado; al guardarlo se releen los rangos en segundo plano."""
+        w = self._watcher
+        if w is not None and (w.path, w.sheet) == (p, sh):
+            w.rebase(self.tables, self.model)  # esta carga ya es la versión vigente
+            return
+        if w is not None:
+            w.stop()
+        if self._watch_job is None:
+            self._watch_job = self.after(WATCH_POLL_MS, self._poll_watch)
+        w = self._watcher = WorkbookWatcher(p, sh, formulas=self.var_wbf.get(), tables=self.tables, model=self.model)
+        w.start(lambda r: self._watch_q.put((w, r)))  # corre en el hilo del vigilante: sin Tk
+
+    def _poll_watch(self):
+        try:
+            while True:
+                w, r = self._watch_q.get_nowait()
+                # de un libro anterior, o con una carga manual en curso (que trae lo último): se descarta
+                if w is self._watcher and (w.path, w.sheet) == self._src and self._load_q is None:
+                    self._apply_reload(r)
+        except queue.Empty:
+            pass
+        self._watch_job = self.after(WATCH_POLL_MS, self._poll_watch) if self._watcher is not None else None
+
+    def _apply_reload(self, r):
+        now = time.strftime("%H:%M:%S")
+        if r.error is not None:
+            self.lbl_status.config(text=f"{now} El libro cambió pero no se pudo releer ({r.error}); se conservan las tablas anteriores")
+            return
+        if not r.changed:
+            self.lbl_status.config(text=f"{now} Libro guardado sin cambios en A4:B22, R3:S14, H3:H30 ni en las fórmulas")
+            return
+        self.model = r.model
+        self._set_tables(r.tables)  # los bloques en vivo se recalculan con las tablas nuevas
+        self._update_recent()
+        self.lbl_status.config(text=f"{now} Libro actualizado: cambios en {', '.join(r.changed)}")
+
+    def cancel_load(self):
+        if self._load_q is None:
+            return
+        self._load_q = None  # el hilo termina solo; su resultado se descarta
+        self._set_loading(False)
+        self.lbl_status.config(text="Carga cancelada; se conservan las tablas anteriores")
+
+    def _set_loading(self, loading):
+        # los cálculos esperan a que lleguen las tablas
+        for b in (self.btn_blue, self.btn_orange):
+            b.state(["disabled"] if loading else ["!disabled"])
+        self.btn_cancel.state(["!disabled"] if loading else ["disabled"])
 
     # ---- Cálculos AZUL (idéntico a tus fórmulas) ----
     def calc_blue(self):
@@ -378,62 +488,8 @@ class App(tk.Tk):
                 messagebox.showerror("Entrada inválida", "Ambient °C (Q2) debe ser numérico.")
                 return
 
-        # Base: I3, I4
-        if i2 == 0:
-            self.b_i2.set(BLANK); self.b_i3.set(BLANK); self.b_i4.set(BLANK)
-            base_ok = False
-        else:
-            self.b_i2.set(fmt(i2))
-            self.b_i3.set(fmt(to_kw(i2)))
-            self.b_i4.set(fmt(to_watts(i2)))
-            base_ok = True
-
-        # 50Hz L2, L3
-        if not base_ok:
-            self.b_l2.set(BLANK); self.b_l3.set(BLANK)
-        else:
-            l2 = i2 * 1.15
-            self.b_l2.set(fmt(l2))
-            self.b_l3.set(fmt(pick_nema_hp(l2, self.nema_steps)))
-
-        # U2
-        if amb is None or amb not in self.tbl_blue:
-            self.b_q2.set(BLANK if amb is None else fmt(amb))
-            self.b_u2.set(BLANK)
-            u2 = None
-        else:
-            self.b_q2.set(fmt(amb))
-            u2 = self.tbl_blue[amb] / 100.0
-            self.b_u2.set(fmt(u2, nd=3))
-
-        # Y2, kW, W, NEMA(Y2)
-        if not base_ok or u2 is None:
-            self.b_y2.set(BLANK); self.b_y2kw.set(BLANK); self.b_y2w.set(BLANK); self.b_y2n.set(BLANK)
-            self.b_ab2.set(BLANK); self.b_ab3.set(BLANK)
-            self.b_ae2.set(BLANK); self.b_ae3.set(BLANK)
-            self.b_ah2.set(BLANK); self.b_ah3.set(BLANK)
-        else:
-            y2 = i2 / u2
-            self.b_y2.set(fmt(y2))
-            self.b_y2kw.set(fmt(to_kw(y2)))
-            self.b_y2w.set(fmt(to_watts(y2)))
-            self.b_y2n.set(fmt(pick_nema_hp(y2, self.nema_steps)))
-
-            # Tolerancia EC: AB2=Y2*0.94, AB3=NEMA(AB2)
-            ab2 = y2 * 0.94
-            self.b_ab2.set(fmt(ab2))
-            self.b_ab3.set(fmt(pick_nema_hp(ab2, self.nema_steps)))
-
-            # 50Hz desde Y2: AE2=Y2*1.15, AE3=NEMA(AE2)
-            ae2 = y2 * 1.15
-            self.b_ae2.set(fmt(ae2))
-            self.b_ae3.set(fmt(pick_nema_hp(ae2, self.nema_steps)))
+        self._calc("blue", self._blue_out, i2, amb)
 
-            # EC + 50Hz: AH2=AE2*0.94, AH3=NEMA(AH2)
-            ah2 = ae2 * 0.94
-            self.b_ah2.set(fmt(ah2))
-            self.b_ah3.set(fmt(pick_nema_hp(ah2, self.nema_steps)))
-
     # ---- Cálculos NARANJA (idéntico a tus fórmulas) ----
     def calc_orange(self):
         # I8
@@ -451,67 +507,95 @@ class App(tk.Tk):
                 messagebox.showerror("Entrada inválida", "FASL/MASL (Q8) debe ser numérico.")
                 return
 
-        # Base: I9, I10
-        if i8 == 0:
-            self.o_i8.set(BLANK); self.o_i9.set(BLANK); self.o_i10.set(BLANK)
-            base_ok = False
-        else:
-            self.o_i8.set(fmt(i8))
-            self.o_i9.set(fmt(to_kw(i8)))
-            self.o_i10.set(fmt(to_watts(i8)))
-            base_ok = True
-
-        # 50Hz L8, L9
-        if not base_ok:
-            self.o_l8.set(BLANK); self.o_l9.set(BLANK)
-        else:
-            l8 = i8 * 1.15
-            self.o_l8.set(fmt(l8))
-            self.o_l9.set(fmt(pick_nema_hp(l8, self.nema_steps)))
-
-        # U8 (lookup exacto en R3:S14)
-        if q8 is None or q8 not in self.tbl_orange:
-            self.o_u8.set(BLANK)
-            u8 = None
-        else:
-            u8 = self.tbl_orange[q8] / 100.0
-            self.o_u8.set(fmt(u8, nd=3))
-
-        # Y8, kW, W, NEMA(Y8)
-        if not base_ok or u8 is None:
-            self.o_y8.set(BLANK); self.o_y8kw.set(BLANK); self.o_y8w.set(BLANK); self.o_y8n.set(BLANK)
-            y8 = None
-        else:
-            y8 = i8 / u8
-            self.o_y8.set(fmt(y8))
-            self.o_y8kw.set(fmt(to_kw(y8)))
-            self.o_y8w.set(fmt(to_watts(y8)))
-            self.o_y8n.set(fmt(pick_nema_hp(y8, self.nema_steps)))
-
-        # Tolerancia EC: AB8=Y8*0.94, AB9=NEMA(AB8)
-        if y8 is None:
-            self.o_ab8.set(BLANK); self.o_ab9.set(BLANK)
-        else:
-            ab8 = y8 * 0.94
-            self.o_ab8.set(fmt(ab8))
-            self.o_ab9.set(fmt(pick_nema_hp(ab8, self.nema_steps)))
-
-        # 50Hz desde Y8: AE8=Y8*1.15, AE9=NEMA(AE8)
-        if y8 is None:
-            self.o_ae8.set(BLANK); self.o_ae9.set(BLANK)
-            ae8 = None
-        else:
-            ae8 = y8 * 1.15
-            self.o_ae8.set(fmt(ae8))
-            self.o_ae9.set(fmt(pick_nema_hp(ae8, self.nema_steps)))
-
-        # EC + 50Hz: AH8=AE8*0.94, AH9=NEMA(AH8)
-        if ae8 is None:
-            self.o_ah8.set(BLANK); self.o_ah9.set(BLANK)
+        self._calc("orange", self._orange_out, i8, q8)
+
+    def _calc(self, block, out, hp, key):
+        if not TRACE:
+            rec = self._compute(block)(hp, key, self.tables, self.var_lookup.get())
+            self._render(out, rec)
+            self._save_result(rec)
+            return
+        misses = self._memo.misses
+        with span(f"calc_{block}", hp=hp, clave=key):
+            rec = self._compute(block)(hp, key, self.tables, self.var_lookup.get())
+            self._render(out, rec)
+        self._save_result(rec)
+        # una búsqueda en A4:B22/R3:S14 por registro calculado (los aciertos del memo no buscan)
+        count(f"calc_{block} búsquedas", self._memo.misses - misses)
+        count(f"calc_{block} celdas", sum(v is not None for v in rec))
+
+    def _compute(self, block):
+        """compute_blue/compute_orange (memorizado) del motor fijo o, con "Fórmulas del libro", del modelo de la hoja."""
+        model = self.model if self.var_wbf.get() else None
+        return partial(self._memo.compute, block, model=model)
+
+    def _render(self, out_vars, rec):
+        """Escribe solo los widgets cuyo texto cambia (rec: registro o dict parcial)."""
+        vals = rec if isinstance(rec, dict) else rec._asdict()
+        for name, value in vals.items():
+            var = out_vars.get(name)
+            if var is None:
+                continue
+            text = fmt(value, nd=PRECISION.get(name, 2))
+            if var.get() != text:
+                var.set(text)
+
+    # ---- Cálculo en vivo (I2/Q2, I8/Q8 con debounce) ----
+    def _setup_live(self):
+        self._live = {"blue": LiveBlock.blue(self.tables), "orange": LiveBlock.orange(self.tables)}
+        self._live_io = {
+            "blue":   (self.i2_hp, self.q2_amb, self._blue_out),
+            "orange": (self.i8_hp, self.q8_fasl, self._orange_out),
+        }
+        self._live_job = {}
+        for block, (hp_var, key_var, _) in self._live_io.items():
+            for v in (hp_var, key_var):
+                v.trace_add("write", lambda *_, b=block: self._schedule_live(b))
+        self.var_lookup.trace_add("write", lambda *_: self._refresh_live(mode=self.var_lookup.get()))
+        self.var_live.trace_add("write", lambda *_: self._refresh_live(full=True))
+        self.var_wbf.trace_add("write", lambda *_: self._toggle_wbf())
+
+    def _toggle_wbf(self):
+        wbf = self.var_wbf.get()
+        if self._watcher is not None:
+            self._watcher.formulas = wbf
+        if wbf and self.model is None and self._src is not None:
+            # las fórmulas se leen al pedirlas: las tablas salen del registro, el modelo del libro
+            self.load_from_excel(preload=True, src=self._src)
+            return  # _apply_load recalcula al llegar el modelo
+        self._refresh_live(full=True)
+
+    def _schedule_live(self, block):
+        if not self.var_live.get():
+            return
+        job = self._live_job.pop(block, None)
+        if job is not None:
+            self.after_cancel(job)
+        self._live_job[block] = self.after(LIVE_DEBOUNCE_MS, self._run_live, block)
+
+    def _run_live(self, block, full=False, **kw):
+        self._live_job.pop(block, None)
+        hp_var, key_var, out = self._live_io[block]
+        try:
+            hp, key = _parse_opt(hp_var.get()), _parse_opt(key_var.get())
+        except ValueError:
+            return  # entrada a medio escribir: se deja lo último válido
+        changed = self._live[block].update(hp=hp, key=key, **kw)
+        if self.var_wbf.get() and self.model is not None:
+            # el grafo incremental sigue las fórmulas fijas; el modelo del libro evalúa el bloque entero
+            self._render(out, self._compute(block)(hp, key, self.tables, self.var_lookup.get()))
         else:
-            ah8 = ae8 * 0.94
-            self.o_ah8.set(fmt(ah8))
-            self.o_ah9.set(fmt(pick_nema_hp(ah8, self.nema_steps)))
+            self._render(out, self._live[block].result() if full else changed)
+
+    def _refresh_live(self, full=False, **kw):
+        """Tablas o modo de búsqueda nuevos: recalcula solo las celdas afectadas."""
+        if not hasattr(self, "_live"):
+            return  # aún construyendo la ventana
+        for block, lb in self._live.items():
+            if self.var_live.get():
+                self._run_live(block, full=full, **kw)
+            elif kw:
+                lb.update(**kw)
 
     # ---- util ----
     def clear_all(self):
@@ -529,45 +613,146 @@ class App(tk.Tk):
         ]:
             v.set(BLANK)
 
+    # ---- sitio (ambiente + altitud en una pasada) ----
+    def calc_site(self):
+        try:
+            hp = _parse_opt(self.i2_hp.get()) or 0.0
+            amb, fasl = _parse_opt(self.q2_amb.get()), _parse_opt(self.q8_fasl.get())
+        except ValueError:
+            messagebox.showerror("Entrada inválida", "HP (I2), Q2 y Q8 deben ser numéricos.")
+            return
+        rule = SITE_RULE_LABELS[self.var_site_rule.get()]
+        r = self._memo.compute_site(hp, amb, fasl, self.tables, self.var_lookup.get(), rule)
+        if r.s_u is None:
+            self.var_site_out.set("sin % para esa condición" if hp else BLANK)
+            return
+        parts = [f"U {fmt(r.s_u, 3)}"]
+        if amb is not None and fasl is not None:
+            parts[0] += f" ({fmt(r.s_u_amb, 3)}{'×' if rule == 'product' else ' vs '}{fmt(r.s_u_alt, 3)})"
+        nema = "/".join(fmt(v) for v in (r.s_y_nema, r.s_ab_nema, r.s_ae_nema, r.s_ah_nema))
+        parts += [f"Y {fmt(r.s_y)} HP", f"NEMA Y/AB/AE/AH {nema}"]
+        self.var_site_out.set(" · ".join(parts))
+
+    # ---- resultados guardados ----
+    def _save_result(self, rec):
+        self.results.append(rec)  # el otro bloque queda vacío en esa fila
+        self._update_nres()
+
+    def _update_nres(self):
+        n = len(self.results)
+        self.var_nres.set(f"{n} cálculo{'s' if n != 1 else ''} ({self.results.nbytes / 1024:.1f} KB)")
+
+    def export_results(self):
+        if not len(self.results):
+            messagebox.showinfo("Resultados", "No hay cálculos guardados.")
+            return
+        path = filedialog.asksaveasfilename(title="Exportar resultados", defaultextension=".csv",
+                                            filetypes=list(EXPORT_TYPES))
+        if not path:
+            return
+        try:
+            n = self.results.save(path)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.lbl_status.config(text=f"{n} cálculos exportados a {Path(path).name}")
+
+    def clear_results(self):
+        self.results.clear()
+        self._update_nres()
+
+    # ---- dimensionamiento inverso ----
+    def _sizing_grid(self):
+        """Umbrales de solver.SizingGrid para las tablas actuales (se arman una vez por carga)."""
+        if self._grid is None or self._grid.tables is not self.tables:
+            from solver import SizingGrid
+            self._grid = SizingGrid(self.tables)
+            if hasattr(self, "cmb_inv_step"):
+                steps = [f"{s:g}" for s in self._grid.steps]
+                self.cmb_inv_step.config(values=steps)
+                if self.var_inv_step.get() not in steps:
+                    self.var_inv_step.set(steps[len(steps) // 2] if steps else "")
+        return self._grid
+
+    def solve_inverse(self):
+        """HP base (I2/I8) más grande cuya etapa elegida aún cabe en el paso NEMA, para esa condición."""
+        block = "blue" if self.var_inv_block.get() == "AZUL" else "orange"
+        raw = self.var_inv_key.get().strip() or (self.q2_amb if block == "blue" else self.q8_fasl).get().strip()
+        try:
+            key = _parse_opt(raw)
+            step = float(self.var_inv_step.get())
+        except ValueError:
+            messagebox.showerror("Entrada inválida", "El paso NEMA y la condición deben ser numéricos.")
+            return
+        try:
+            hp = self._sizing_grid().max_hp(block, key, step, self.var_inv_stage.get().lower(), self.var_lookup.get())
+        except ValueError as e:
+            messagebox.showerror("Paso NEMA", str(e))
+            return
+        cell = "I2" if block == "blue" else "I8"
+        # truncado, no redondeado: el valor mostrado tiene que caber en el paso
+        self.var_inv_out.set(f"{cell} ≤ {fmt(int(hp * 100) / 100)} HP" if hp is not None else "sin % para esa condición")
+
+    def show_grid(self):
+        block = "blue" if self.var_inv_block.get() == "AZUL" else "orange"
+        stage = self.var_inv_stage.get()
+        win = tk.Toplevel(self)
+        win.title(f"HP base máx. — {self.var_inv_block.get()} · {stage}")
+        txt = tk.Text(win, width=110, height=24, font=("Courier", 9), wrap="none")
+        txt.insert("1.0", self._sizing_grid().describe(block, stage.lower()))
+        txt.config(state="disabled")
+        txt.pack(fill="both", expand=True, padx=8, pady=8)
+
+    def show_diagnostics(self):
+        """Resumen de tramos y contadores; "Guardar traza…" escribe JSON (chrome://tracing) o texto."""
+        win = tk.Toplevel(self)
+        win.title("Diagnóstico")
+        txt = tk.Text(win, width=78, height=24, font=("Courier", 9))
+        txt.insert("1.0", RECORDER.summary())
+        txt.config(state="disabled")
+        txt.pack(fill="both", expand=True, padx=8, pady=8)
+
+        def save():
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".json",
+                                                filetypes=[("Chrome trace", "*.json"), ("Texto", "*.txt")])
+            if path:
+                RECORDER.write(path)
+        bar = ttk.Frame(win)
+        bar.pack(fill="x", padx=8, pady=(0, 8))
+        ttk.Button(bar, text="Guardar traza…", command=save).pack(side="left")
+        ttk.Button(bar, text="Limpiar", command=lambda: (RECORDER.clear(), win.destroy())).pack(side="left", padx=6)
+        ttk.Button(bar, text="Cerrar", command=win.destroy).pack(side="right")
+
     def show_formulas(self):
-        text = (
-            "Bloque AZUL:\n"
-            "  I3 = I2 / 1.341\n"
-            "  I4 = I3 * 1000\n"
-            "  L2 = I2 * 1.15\n"
-            "  L3 = NEMA(L2)\n"
-            "  U2 = VLOOKUP(A4:B22)/100\n"
-            "  Y2 = I2 / U2\n"
-            "  Y3 = Y2 / 1.341\n"
-            "  Y4 = Y3 * 1000\n"
-            "  AB2 = Y2 * 0.94\n"
-            "  AE2 = Y2 * 1.15\n"
-            "  AH2 = AE2 * 0.94\n"
-            "\nBloque NARANJA:\n"
-            "  I9 = I8 / 1.341\n"
-            "  I10 = I9 * 1000\n"
-            "  L8 = I8 * 1.15\n"
-            "  L9 = NEMA(L8)\n"
-            "  U8 = VLOOKUP(R3:S14)/100\n"
-            "  Y8 = I8 / U8\n"
-            "  AB8 = Y8 * 0.94\n"
-            "  AE8 = Y8 * 1.15\n"
-            "  AH8 = AE8 * 0.94\n"
-        )
-        messagebox.showinfo("Fórmulas", text)
-
-    def pick_excel(self):
-        path = filedialog.askopenfilename(
-            title="Selecciona Excel",
-            filetypes=[("Excel files", "*.xlsx;*.xlsm;*.xltx;*.xltm"), ("All files", "*.*")]
-        )
-        if path:
-            self.var_xlsx.set(path)
-
+        # las fórmulas en uso: las del libro o, donde falten, las predeterminadas
+        from formulas import default_model
+        messagebox.showinfo("Fórmulas", (self.model or default_model()).describe())
+
+# ---- formulario antiguo (carga diferida) ----
+def __getattr__(name):
+    # build_basic_form/create_row viven en legacy_form.py y solo se importan si se piden
+    if name in ("build_basic_form", "create_row"):
+        import legacy_form
+        return getattr(legacy_form, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # ===== Main =====
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "batch":
+        # python app.py batch --in motores.csv --out salida.csv --block both
+        from batch_io import main as batch_main
+        return batch_main(argv[1:], default_xlsx=DEFAULT_XLSX_PATH)
+    if argv and argv[0] == "serve":
+        # python app.py serve --port 8765 (ver service.py)
+        from service import main as serve_main
+        return serve_main(argv[1:], default_xlsx=DEFAULT_XLSX_PATH)
+    if argv and argv[0] == "solve":
+        # python app.py solve --block blue --key 50 (ver solver.py)
+        from solver import main as solve_main
+        return solve_main(argv[1:], default_xlsx=DEFAULT_XLSX_PATH)
     app = App()
     app.mainloop()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
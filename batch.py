@@ -0,0 +1,165 @@
+# batch.py
+# Dimensionamiento por lotes: mismas fórmulas que engine.py sobre arreglos NumPy.
+
+"""Vectorized blue/orange sizing for whole motor lists.
+
+Every output column of ``engine.BlueResult``/``engine.OrangeResult`` is
+returned as a float array.  Blank cells (``BLANK`` in the UI) are ``NaN``;
+NEMA columns hold the step in HP, ``NaN`` when blank and ``inf`` for the
+">800 HP" overflow.  :func:`format_columns` turns them into the window's
+text, for CSV or display.
+"""
+
+from engine import (
+    F_50HZ, F_EC, LOOKUP_MODES, NEMA_FIELDS, PRECISION, SITE_RULES, BlueResult, OrangeResult, SiteResult,
+    as_lookup_table, as_nema_table, fmt_column, to_kw, to_watts,
+)
+
+np = None  # numpy se importa en el primer uso (ver _require_numpy)
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except Exception:
+            raise RuntimeError("Instala numpy: pip install numpy")
+        np = numpy
+
+
+def _as_array(x, n=None):
+    if x is None:
+        return np.full(n, np.nan)
+    return np.asarray(x, dtype=float)
+
+
+# ---------- búsquedas ----------
+def nema_steps_array(tables):
+    _require_numpy()
+    # vista sin copia del array('d') de NemaTable
+    return np.frombuffer(as_nema_table(tables.nema).steps, dtype=float)
+
+def nema_vec(x, steps):
+    """pick_nema_hp vectorizado con np.searchsorted."""
+    _require_numpy()
+    x = np.asarray(x, dtype=float)
+    if not len(steps):
+        return np.where(x > 0, np.inf, np.nan)
+    idx = np.searchsorted(steps, x, side="left")
+    out = np.where(idx >= len(steps), np.inf, steps[np.minimum(idx, len(steps) - 1)])
+    with np.errstate(invalid="ignore"):
+        return np.where(x > 0, out, np.nan)
+
+def lookup_vec(keys, table, mode="exact"):
+    """LookupTable.lookup vectorizado: NaN donde no hay valor."""
+    _require_numpy()
+    if mode not in LOOKUP_MODES:
+        raise ValueError(f"Modo de búsqueda desconocido: {mode}")
+    keys = np.asarray(keys, dtype=float)
+    t = as_lookup_table(table)
+    if not len(t):
+        return np.full(keys.shape, np.nan)
+    k = np.frombuffer(t.xs, dtype=float)
+    v = np.frombuffer(t.ys, dtype=float)
+    last = len(k) - 1
+    if mode == "linear":
+        return np.interp(keys, k, v, left=np.nan, right=np.nan)
+    idx = np.minimum(np.searchsorted(k, keys), last)
+    if mode == "exact":
+        return np.where(k[idx] == keys, v[idx], np.nan)
+    if mode == "floor":
+        idx = np.searchsorted(k, keys, side="right") - 1
+        out = np.where(idx >= 0, v[np.maximum(idx, 0)], np.nan)
+    else:
+        # nearest: vecino inferior vs. superior, empate -> superior
+        lo = np.maximum(idx - 1, 0)
+        use_hi = (np.abs(k[idx] - keys) <= np.abs(keys - k[lo])) | (keys >= k[idx])
+        out = np.where(use_hi, v[idx], v[lo])
+    return np.where(np.isnan(keys), np.nan, out)
+
+def lookup_exact(keys, table):
+    """VLOOKUP con coincidencia exacta: NaN donde la clave no está en la tabla."""
+    return lookup_vec(keys, table, "exact")
+
+
+# ---------- cálculos ----------
+def _derate_vec(hp, load_pct, steps):
+    """Misma secuencia de columnas que engine._derate, en arreglos."""
+    return _derate_vec_u(hp, load_pct / 100.0, steps)
+
+def _derate_vec_u(hp, u, steps):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        base = np.where(hp != 0, hp, np.nan)
+        l = base * F_50HZ
+        y = base / u
+        ab = y * F_EC
+        ae = y * F_50HZ
+        ah = ae * F_EC
+        return (base, to_kw(base), to_watts(base), l, nema_vec(l, steps), u,
+                y, to_kw(y), to_watts(y), nema_vec(y, steps),
+                ab, nema_vec(ab, steps), ae, nema_vec(ae, steps), ah, nema_vec(ah, steps))
+
+def size_blue(hp, ambient_c, tables, mode="exact"):
+    """Bloque AZUL para arreglos de HP (I2) y ambiente °C (Q2)."""
+    _require_numpy()
+    hp = _as_array(hp)
+    amb = _as_array(ambient_c, hp.shape)
+    v = _derate_vec(hp, lookup_vec(amb, tables.blue, mode), nema_steps_array(tables))
+    return dict(zip(BlueResult._fields, v[:5] + (amb,) + v[5:]))
+
+def size_orange(hp, fasl, tables, mode="exact"):
+    """Bloque NARANJA para arreglos de HP (I8) y FASL/MASL (Q8)."""
+    _require_numpy()
+    hp = _as_array(hp)
+    q8 = _as_array(fasl, hp.shape)
+    v = _derate_vec(hp, lookup_vec(q8, tables.orange, mode), nema_steps_array(tables))
+    return dict(zip(OrangeResult._fields, v[:5] + (q8,) + v[5:]))
+
+def _site_factor_vec(keys, table, mode):
+    # como engine._site_factor: sin clave (NaN) -> 1.0
+    return np.where(np.isnan(keys), 1.0, lookup_vec(keys, table, mode) / 100.0)
+
+def size_site(hp, ambient_c=None, fasl=None, tables=None, mode="exact", rule="product"):
+    """Sitio (engine.compute_site) para arreglos: ambiente y altitud en una pasada."""
+    if rule not in SITE_RULES:
+        raise ValueError(f"Regla de sitio desconocida: {rule}")
+    _require_numpy()
+    hp = _as_array(hp)
+    amb = _as_array(ambient_c, hp.shape)
+    alt = _as_array(fasl, hp.shape)
+    ua = _site_factor_vec(amb, tables.blue, mode)
+    ub = _site_factor_vec(alt, tables.orange, mode)
+    u = ua * ub if rule == "product" else np.minimum(ua, ub)  # NaN si falta alguno
+    v = _derate_vec_u(hp, u, nema_steps_array(tables))
+    blank_a = np.where(np.isnan(amb), np.nan, ua)
+    blank_b = np.where(np.isnan(alt), np.nan, ub)
+    return dict(zip(SiteResult._fields, v[:5] + (amb, blank_a, alt, blank_b) + v[5:]))
+
+def size_batch(hp, ambient_c=None, fasl=None, tables=None, mode="exact"):
+    """Ambos bloques para el mismo HP; devuelve {columna: arreglo}."""
+    out = size_blue(hp, ambient_c, tables, mode)
+    out.update(size_orange(hp, fasl, tables, mode))
+    return out
+
+def format_columns(cols, tables=None):
+    """{columna: arreglo} de size_batch -> {columna: lista de textos}, como los muestra la ventana.
+
+    Mismas cadenas que ``engine.fmt`` (NaN -> BLANK, inf -> ">N HP"), pero
+    cada valor distinto de una columna se formatea una sola vez.
+    """
+    overflow = as_nema_table(tables.nema).overflow if tables is not None else ">800 HP"
+    return {k: fmt_column(a, PRECISION.get(k, 2), inf=overflow if k in NEMA_FIELDS else None)
+            for k, a in cols.items()}
+
+def size_frame(df, tables, hp="hp", ambient="ambient_c", fasl="fasl", mode="exact"):
+    """Versión pandas: agrega las columnas de salida a una copia de df."""
+    import pandas as pd
+    cols = size_batch(
+        df[hp].to_numpy(dtype=float),
+        df[ambient].to_numpy(dtype=float) if ambient in df else None,
+        df[fasl].to_numpy(dtype=float) if fasl in df else None,
+        tables,
+        mode,
+    )
+    return pd.concat([df, pd.DataFrame(cols, index=df.index)], axis=1)
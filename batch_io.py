@@ -0,0 +1,382 @@
+# batch_io.py
+# Línea de comandos: python app.py batch --in motores.csv --out salida.csv --block both
+
+"""Streaming batch sizing from CSV/XLSX files.
+
+Rows flow through a generator pipeline (read -> size -> write), so memory
+use does not grow with the input.  CSV output holds the same trimmed
+strings the window shows (formatted through ``engine.formatter``, which
+memoizes the text of repeated values); ``--raw`` writes the full-precision
+numbers instead.  XLSX output (openpyxl write-only mode) keeps the numbers
+as numbers and leaves blank cells empty; ``.parquet``/``.arrow``/``.feather``
+output collects the rows in a ``results.ResultStore`` and needs pyarrow.
+
+With ``--workers N`` the rows are cut into chunks and sized in a
+``ProcessPoolExecutor``; the tables reach each worker once through the
+pool initializer and the chunks are written back in input order.
+
+``--formulas`` sizes with the sheet's own formulas (``formulas.FormulaModel``)
+instead of the engine's fixed ones.  ``--xlsx-col``/``--sheet-col`` let
+each row pick its own workbook/sheet; the tables come from the in-memory
+``registry.REGISTRY``, so every sheet is parsed once per process.
+Repeated (HP, key) rows are answered from an ``engine.ResultCache``
+(``--memo``), so duplicated catalog ratings cost one dict probe.
+``--block site`` derates each motor for ambient and altitude in one pass
+(``engine.compute_site``, combined by ``--rule product|worst``).
+``--watch SECONDS`` checks the workbook during a long serial run
+(``watcher.WorkbookWatcher``); rows after a save use the reloaded tables.
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from pathlib import Path
+
+from engine import (
+    LOOKUP_MODES, SITE_RULES, BlueResult, OrangeResult, ResultCache, SiteResult,
+    compute_blue, compute_orange, compute_site, field_formatters,
+)
+from excel_tables import DEFAULT_SHEET
+from instrument import count, span
+from registry import REGISTRY
+from results import ResultStore
+
+BLOCKS = ("blue", "orange", "both", "site")
+WATCH_EVERY = 1024  # filas entre consultas del reloj con --watch
+
+
+# ---------- lectura ----------
+COLUMNAR = (".parquet", ".arrow", ".feather")
+
+def is_columnar(path):
+    return Path(path).suffix.lower() in COLUMNAR
+
+def is_xlsx(path):
+    return Path(path).suffix.lower() in (".xlsx", ".xlsm")
+
+def _read_csv(path):
+    f = open(path, newline="", encoding="utf-8-sig")
+    reader = csv.reader(f)
+    header = next(reader, [])
+
+    def rows():
+        with f:
+            for row in reader:
+                yield dict(zip(header, row))
+    return header, rows()
+
+def _read_xlsx(path):
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    it = wb.active.iter_rows(values_only=True)
+    header = [str(h) if h is not None else "" for h in next(it, ())]
+
+    def rows():
+        try:
+            for row in it:
+                yield dict(zip(header, row))
+        finally:
+            wb.close()
+    return header, rows()
+
+def read_rows(path):
+    """Devuelve (encabezado, generador de filas dict)."""
+    if is_xlsx(path):
+        return _read_xlsx(path)
+    return _read_csv(path)
+
+
+# ---------- cálculo ----------
+def _num(v):
+    """Celda -> float; vacío, no numérico, NaN o infinito -> None."""
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        try:
+            x = float(v)
+        except OverflowError:  # entero demasiado grande para un float
+            return None
+    else:
+        v = str(v).strip()
+        if v == "":
+            return None
+        try:
+            x = float(v)  # acepta "nan"/"inf": se descartan abajo
+        except ValueError:
+            return None
+    return x if math.isfinite(x) else None
+
+def output_fields(block):
+    if block == "site":
+        return SiteResult._fields
+    return (BlueResult._fields if block in ("blue", "both") else ()) + \
+           (OrangeResult._fields if block in ("orange", "both") else ())
+
+def _book_for(row, xlsx_col, sheet_col, xlsx, sheet):
+    p = (str(row.get(xlsx_col) or "").strip() if xlsx_col else "") or xlsx
+    sh = (str(row.get(sheet_col) or "").strip() if sheet_col else "") or sheet
+    return p, sh
+
+def size_rows(rows, tables, block="both", hp_col="hp", amb_col="ambient_c", fasl_col="fasl", mode="exact",
+              model=None, xlsx_col=None, sheet_col=None, xlsx=None, sheet=DEFAULT_SHEET, memo=None,
+              rule="product", watch=None):
+    """Genera, por cada fila de entrada, la fila con las columnas de salida agregadas.
+
+    ``model`` (formulas.FormulaModel) evalúa las fórmulas del libro en lugar
+    de las fijas del motor.  Con ``xlsx_col``/``sheet_col`` cada fila puede
+    nombrar su libro/hoja (vacío = ``xlsx``/``sheet``); esas tablas salen de
+    registry.REGISTRY, así que cada hoja se lee una sola vez por proceso.
+    ``memo`` (engine.ResultCache) evita recalcular filas repetidas.
+    ``block="site"`` pasa cada motor por ambiente y altitud a la vez
+    (engine.compute_site, combinados según ``rule``; fórmulas fijas).
+    ``watch`` (watcher.WorkbookWatcher) se consulta cada WATCH_EVERY filas:
+    si el libro cambió, las filas siguientes usan las tablas nuevas.
+    """
+    if rule not in SITE_RULES:
+        raise ValueError(f"Regla de sitio desconocida: {rule}")
+    books = {}  # (libro, hoja) -> (tablas, compute_blue, compute_orange, compute_site)
+
+    def engine_for(t, m):
+        if memo is not None:
+            return t, partial(memo.compute_blue, model=m), partial(memo.compute_orange, model=m), memo.compute_site
+        if m is None:
+            return t, compute_blue, compute_orange, compute_site
+        return t, m.compute_blue, m.compute_orange, compute_site
+
+    current = engine_for(tables, model)
+    for i, row in enumerate(rows):
+        if watch is not None and not i % WATCH_EVERY and watch.due():
+            r = watch.poll()
+            if r is not None and r.error is None:
+                current = engine_for(r.tables, r.model)
+                books.clear()  # las tablas por fila también se vuelven a pedir al registro
+                print(f"tablas recargadas en la fila {i + 1}: {', '.join(r.changed) or 'sin cambios'}",
+                      file=sys.stderr)
+            elif r is not None:
+                print(f"recarga fallida en la fila {i + 1}: {r.error}", file=sys.stderr)
+        if xlsx_col or sheet_col:
+            key = _book_for(row, xlsx_col, sheet_col, xlsx, sheet)
+            current = books.get(key)
+            if current is None:
+                t = REGISTRY.get(*key)[0]
+                m = REGISTRY.get(*key, "formulas")[0] if model is not None else None
+                current = books[key] = engine_for(t, m)
+        t, blue, orange, site = current
+        hp = _num(row.get(hp_col)) or 0.0
+        out = dict(row)
+        if block in ("blue", "both"):
+            out.update(blue(hp, _num(row.get(amb_col)), t, mode)._asdict())
+        if block in ("orange", "both"):
+            out.update(orange(hp, _num(row.get(fasl_col)), t, mode)._asdict())
+        if block == "site":
+            out.update(site(hp, _num(row.get(amb_col)), _num(row.get(fasl_col)), t, mode, rule)._asdict())
+        yield out
+
+
+# ---------- escritura ----------
+def row_formatter(header, fields, text=True):
+    """Función fila dict -> lista en el orden del encabezado (texto con fmt para CSV).
+
+    Los formateadores por campo se eligen una vez, no en cada celda;
+    ``text=False`` deja los números tal cual (XLSX y ``--raw``).
+    """
+    if not text:
+        return lambda row: [row.get(k) for k in header]
+    fs = field_formatters(fields)
+    cols = [(k, fs.get(k)) for k in header]
+    return lambda row: [f(row[k]) if f else row.get(k, "") for k, f in cols]
+
+def _write_csv(path, header, values):
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        for vals in values:
+            w.writerow(vals)
+            n += 1
+    return n
+
+def _write_xlsx(path, header, values):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("dimensionado")
+    ws.append(header)
+    n = 0
+    for vals in values:
+        ws.append(vals)
+        n += 1
+    wb.save(path)
+    return n
+
+def write_rows(path, header, values):
+    """Escribe listas de valores de forma incremental; devuelve cuántas filas se escribieron."""
+    if is_xlsx(path):
+        return _write_xlsx(path, header, values)
+    return _write_csv(path, header, values)
+
+
+# ---------- procesos ----------
+_W = {}  # estado de cada proceso trabajador (se llena en _init_worker)
+
+def _init_worker(tables, block, cols, in_header, header, fields, text):
+    _W.update(tables=tables, block=block, cols=cols, in_header=in_header,
+              values=row_formatter(header, fields, text))
+
+def _size_chunk(chunk):
+    t0 = time.perf_counter()
+    rows = (dict(zip(_W["in_header"], r)) for r in chunk)
+    out = list(map(_W["values"], size_rows(rows, _W["tables"], _W["block"], **_W["cols"])))
+    return os.getpid(), len(out), time.perf_counter() - t0, out
+
+def _chunks(rows, in_header, size):
+    it = iter(rows)
+    while True:
+        chunk = [tuple(r.get(k) for k in in_header) for r in islice(it, size)]
+        if not chunk:
+            return
+        yield chunk
+
+def size_parallel(rows, in_header, header, fields, tables, block, cols,
+                  text=True, workers=None, chunk_size=20000, stats=None):
+    """Dimensiona en varios procesos y genera las filas en el orden de entrada.
+
+    Solo hay ``2 * workers`` bloques en vuelo, así que la memoria sigue
+    acotada.  ``stats`` (dict) recibe {pid: [filas, segundos]} por proceso.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = {} if stats is None else stats
+    init = (tables, block, cols, list(in_header), header, set(fields), text)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init) as ex:
+        pending = deque()
+        for chunk in _chunks(rows, in_header, chunk_size):
+            pending.append(ex.submit(_size_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from _drain(pending.popleft(), stats)
+        while pending:
+            yield from _drain(pending.popleft(), stats)
+
+def _drain(fut, stats):
+    pid, n, dt, out = fut.result()
+    st = stats.setdefault(pid, [0, 0.0])
+    st[0] += n
+    st[1] += dt
+    return out
+
+
+# ---------- CLI ----------
+class WriteError(Exception):
+    """No se pudo escribir la salida (la entrada y el libro sí se leyeron)."""
+
+def _tracked(values, failed):
+    # marca si el error vino de leer/dimensionar filas y no del escritor
+    try:
+        yield from values
+    except Exception:
+        failed.append(True)
+        raise
+
+def run_batch(inp, out, tables, block="both", workers=1, chunk_size=20000, stats=None, raw=False, **cols):
+    """``raw`` escribe el CSV con los números sin formatear (repr), para otros programas."""
+    in_header, rows = read_rows(inp)
+    fields = output_fields(block)
+    header = list(in_header) + [f for f in fields if f not in in_header]
+    text = not (raw or is_xlsx(out) or is_columnar(out))
+    watch = cols.pop("watch", None)  # solo en serie: los procesos reciben las tablas una vez
+    if workers and workers > 1:
+        values = size_parallel(rows, in_header, header, fields, tables, block, cols,
+                               text, workers, chunk_size, stats)
+    else:
+        values = map(row_formatter(header, fields, text), size_rows(rows, tables, block, watch=watch, **cols))
+    failed = []
+    values = _tracked(values, failed)
+    try:
+        if is_columnar(out):
+            # Parquet/Arrow se escriben de una vez: las filas se juntan en columnas tipadas
+            store = ResultStore(fields, extra=in_header)
+            store.extend(dict(zip(header, v)) for v in values)
+            return store.save(out)
+        return write_rows(out, header, values)
+    except (OSError, RuntimeError, ValueError) as e:  # ValueError: pyarrow.ArrowInvalid (tipos mezclados)
+        if failed:
+            raise
+        raise WriteError(f"{out}: {e}") from e
+
+def main(argv=None, default_xlsx=None):
+    ap = argparse.ArgumentParser(prog="app.py batch", description="Dimensionamiento por lotes (AZUL/NARANJA).")
+    ap.add_argument("--in", dest="inp", required=True, help="CSV o XLSX de entrada")
+    ap.add_argument("--out", required=True, help="CSV, XLSX, Parquet o Arrow/Feather de salida")
+    ap.add_argument("--block", choices=BLOCKS, default="both")
+    ap.add_argument("--xlsx", default=default_xlsx, help="libro con las tablas (A4:B22, R3:S14, H3:H30)")
+    ap.add_argument("--sheet", default=DEFAULT_SHEET)
+    ap.add_argument("--hp-col", default="hp")
+    ap.add_argument("--amb-col", default="ambient_c")
+    ap.add_argument("--fasl-col", default="fasl")
+    ap.add_argument("--xlsx-col", help="columna con el libro de cada fila (vacío = --xlsx)")
+    ap.add_argument("--sheet-col", help="columna con la hoja de cada fila (vacío = --sheet)")
+    ap.add_argument("--lookup", choices=LOOKUP_MODES, default="exact",
+                    help="búsqueda en A4:B22/R3:S14: exacta, piso (VLOOKUP VERDADERO), más cercana o lineal")
+    ap.add_argument("--rule", choices=tuple(SITE_RULES), default="product",
+                    help="con --block site: multiplicar las fracciones de ambiente y altitud o usar la peor")
+    ap.add_argument("--formulas", action="store_true",
+                    help="evaluar las fórmulas de la hoja (las que falten usan las predeterminadas)")
+    ap.add_argument("--memo", type=int, default=65536,
+                    help="resultados memorizados por proceso para filas repetidas (0 = sin memo)")
+    ap.add_argument("--raw", action="store_true",
+                    help="CSV con los números completos, sin redondear ni recortar (vacío = celda en blanco)")
+    ap.add_argument("--watch", type=float, default=0.0,
+                    help="segundos entre revisiones del libro durante el lote (0 = no vigilar; solo con --workers 1)")
+    ap.add_argument("--workers", type=int, default=1, help="procesos (0 = uno por núcleo)")
+    ap.add_argument("--chunk", type=int, default=20000, help="filas por bloque en modo paralelo")
+    args = ap.parse_args(argv)
+
+    if is_columnar(args.out):
+        try:  # antes de leer nada: sin pyarrow no se podría guardar el resultado
+            import pyarrow  # noqa: F401
+        except ImportError:
+            ap.exit(1, "Instala pyarrow: pip install pyarrow\n")
+    try:
+        tables, _ = REGISTRY.get(args.xlsx, args.sheet)
+        model = REGISTRY.get(args.xlsx, args.sheet, "formulas")[0] if args.formulas else None
+    except Exception as e:
+        ap.exit(1, f"No se pudo cargar: {e}\n")
+    if model is not None:
+        for w in model.warnings:
+            print(f"aviso: {w}", file=sys.stderr)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    watch = None
+    if args.watch > 0:
+        if workers > 1:
+            print("aviso: --watch se ignora con varios procesos", file=sys.stderr)
+        else:
+            from watcher import WorkbookWatcher
+            watch = WorkbookWatcher(args.xlsx, args.sheet, args.formulas, args.watch, tables, model)
+    stats = {}
+    memo = ResultCache(args.memo) if args.memo > 0 else None
+    t0 = time.perf_counter()
+    try:
+        with span("lotes", procesos=workers, bloque=args.block):
+            n = run_batch(args.inp, args.out, tables, args.block, workers, args.chunk, stats,
+                          hp_col=args.hp_col, amb_col=args.amb_col, fasl_col=args.fasl_col, mode=args.lookup,
+                          model=model, xlsx_col=args.xlsx_col, sheet_col=args.sheet_col,
+                          xlsx=args.xlsx, sheet=args.sheet, memo=memo, rule=args.rule, raw=args.raw, watch=watch)
+        count("filas dimensionadas", n)
+    except WriteError as e:
+        ap.exit(1, f"No se pudo escribir: {e}\n")
+    except (OSError, KeyError, RuntimeError) as e:
+        ap.exit(1, f"No se pudo cargar: {e}\n")
+    dt = time.perf_counter() - t0
+    print(f"{n} filas -> {args.out} ({dt:.2f} s, {n / dt if dt else 0:.0f} filas/s)", file=sys.stderr)
+    if memo is not None and not stats:  # en paralelo cada proceso tiene su propio memo
+        st = memo.stats()
+        print(f"  memo: {st['hits']} aciertos, {st['misses']} fallos ({st['hit_rate']:.0%})", file=sys.stderr)
+    for pid, (rows, secs) in sorted(stats.items()):
+        print(f"  proceso {pid}: {rows} filas, {rows / secs if secs else 0:.0f} filas/s", file=sys.stderr)
+    return 0
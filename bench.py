@@ -0,0 +1,280 @@
+# bench.py
+# Mediciones sin pantalla: python bench.py [nombre ...] [--json salida.json] [--compare base.json]
+
+"""Standalone benchmark runner.
+
+Each benchmark returns a dict of measurements; ``--json`` writes them all
+(plus the commit and Python version) to a file and ``--compare`` prints
+the ratio against an earlier file, so runs can be compared across commits.
+
+``startup``
+    Imports ``app`` in a fresh interpreter under ``python -X importtime``
+    and checks the result against ``STARTUP_BUDGET_MS``.
+``tables``
+    ``read_two_col_dict``/``read_nema_steps``/``read_tables`` against the
+    bundled workbook, and a warm ``load_tables`` from the JSON cache.
+``lookups``
+    ``pick_nema_hp``, ``NemaTable.pick_many`` and ``LookupTable.lookup``.
+``fmt``
+    ``fmt`` over a million floats, the memoized ``engine.formatter`` on the
+    same (all distinct) values and on derated catalog ratings, and
+    ``engine.fmt_column`` on the catalog column as a NumPy array.
+``sizing``
+    End-to-end blue+orange sizing of synthetic rows (``--sizes``): the
+    streaming path (``batch_io.size_rows`` + ``row_formatter``, with and
+    without memo) and, if NumPy is installed, ``batch.size_batch``.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+BUNDLED_XLSX = HERE / "PMD NEMA V46 ADAPTED APPLICACION V1.xlsx"
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+# Presupuesto de arranque: importar app (sin crear la ventana)
+STARTUP_BUDGET_MS = 80.0
+# Módulos que no deben cargarse al abrir la ventana
+HEAVY_MODULES = ("openpyxl", "numpy", "pandas", "legacy_form", "batch", "batch_io", "formulas", "service", "solver")
+
+BENCHES = {}
+
+
+def bench(name):
+    def deco(fn):
+        BENCHES[name] = fn
+        return fn
+    return deco
+
+
+def _time(fn, repeat=5):
+    """Mejor y mediana (ms) de ``repeat`` llamadas a fn()."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {"best_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3)}
+
+
+def _synthetic_rows(n, tables, seed=0):
+    """Filas {hp, ambient_c, fasl} con HP de catálogo y claves de la hoja (más algunas ausentes)."""
+    from excel_tables import FALLBACK_NEMA
+    rng = random.Random(seed)
+    amb = list(tables.blue) + [None, 12.5]
+    alt = list(tables.orange) + [None, 3280.0, 5000.0]
+    return [{"hp": rng.choice(FALLBACK_NEMA), "ambient_c": rng.choice(amb), "fasl": rng.choice(alt)}
+            for _ in range(n)]
+
+
+def _importtime(module, runs=5):
+    """Mejor tiempo acumulado (ms) de importar module según -X importtime."""
+    best, loaded = None, []
+    probe = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    for _ in range(runs):
+        p = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                           cwd=HERE, capture_output=True, text=True, check=True)
+        for line in p.stderr.splitlines():
+            parts = [x.strip() for x in line.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                us = int(parts[1])
+                best = us if best is None else min(best, us)
+        loaded = [m for m in p.stdout.strip().split(",") if m]
+    return best / 1000.0, loaded
+
+
+@bench("startup")
+def bench_startup(opts):
+    ms, heavy = _importtime("app")
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], cwd=HERE, check=True)
+    wall = (time.perf_counter() - t0) * 1000.0
+    return {
+        "import_app_ms": round(ms, 2),
+        "interpreter_plus_import_ms": round(wall, 2),
+        "budget_ms": STARTUP_BUDGET_MS,
+        "heavy_modules_loaded": heavy,
+        "ok": ms <= STARTUP_BUDGET_MS and not heavy,
+    }
+
+
+@bench("tables")
+def bench_tables(opts):
+    from excel_tables import (
+        A_COL, A_R0, B_COL, B_R1, DEFAULT_SHEET, NEMA_COL, NEMA_R0, NEMA_R1,
+        R_COL, R_R0, S_COL, S_R1, load_tables, read_nema_steps, read_tables, read_two_col_dict,
+    )
+    x, sh, rep = opts.xlsx, DEFAULT_SHEET, opts.repeat
+    out = {
+        "read_two_col_dict_A4_B22": _time(lambda: read_two_col_dict(x, sh, A_COL, A_R0, B_COL, B_R1), rep),
+        "read_two_col_dict_R3_S14": _time(lambda: read_two_col_dict(x, sh, R_COL, R_R0, S_COL, S_R1), rep),
+        "read_nema_steps": _time(lambda: read_nema_steps(x, sh, NEMA_COL, NEMA_R0, NEMA_R1), rep),
+        "read_tables": _time(lambda: read_tables(x, sh), rep),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = Path(tmp) / "cache.json"
+        load_tables(x, sh, cache_path=cache)  # la primera llena la caché
+        out["load_tables_warm"] = _time(lambda: load_tables(x, sh, cache_path=cache), rep)
+    return out
+
+
+def _tables(opts):
+    # caché propia: no leer ni pisar la de ~/.cm_analisis (cambiaría lo medido y lo que abre la app)
+    from excel_tables import DEFAULT_SHEET, load_tables
+    with tempfile.TemporaryDirectory() as tmp:
+        return load_tables(opts.xlsx, DEFAULT_SHEET, cache_path=Path(tmp) / "cache.json")[0]
+
+
+@bench("lookups")
+def bench_lookups(opts, n=1000000):
+    from engine import LOOKUP_MODES, pick_nema_hp
+    tables = _tables(opts)
+    rng = random.Random(1)
+    xs = [rng.uniform(0.0, 900.0) for _ in range(n)]
+    keys = [rng.uniform(-10.0, 100.0) for _ in range(n // 10)]
+    steps = list(tables.nema)
+    out = {
+        "n": n,
+        "pick_nema_hp_list": _time(lambda: [pick_nema_hp(x, steps) for x in xs[:n // 10]], opts.repeat),
+        "nema_pick_many": _time(lambda: tables.nema.pick_many(xs), opts.repeat),
+    }
+    out["pick_nema_hp_list"]["n"] = n // 10
+    for mode in LOOKUP_MODES:
+        out[f"lookup_{mode}"] = _time(lambda: [tables.blue.lookup(k, mode) for k in keys], opts.repeat)
+        out[f"lookup_{mode}"]["n"] = len(keys)
+    return out
+
+
+@bench("fmt")
+def bench_fmt(opts, n=1000000):
+    from engine import F_50HZ, fmt, fmt_column, formatter
+    from excel_tables import FALLBACK_NEMA
+    rng = random.Random(2)
+    vals = [rng.uniform(0.0, 10000.0) for _ in range(n)]
+    # lo que escribe un lote real: potencias de catálogo derratadas, muy repetidas
+    catalog = [rng.choice(FALLBACK_NEMA) * F_50HZ / rng.choice((0.8, 0.88, 0.94, 1.0)) for _ in range(n)]
+    f = formatter(2)
+    out = {
+        "n": n,
+        "fmt": _time(lambda: [fmt(v) for v in vals], opts.repeat),
+        "formatter": _time(lambda: [f(v) for v in vals], opts.repeat),
+        "formatter_catalog": _time(lambda: [f(v) for v in catalog], opts.repeat),
+    }
+    try:
+        import numpy as np
+    except ImportError:
+        return out
+    arr = np.array(catalog)
+    out["fmt_column_catalog"] = _time(lambda: fmt_column(arr), opts.repeat)
+    return out
+
+
+@bench("sizing")
+def bench_sizing(opts):
+    from batch_io import output_fields, row_formatter, size_rows
+    from engine import ResultCache
+    tables = _tables(opts)
+    fields = output_fields("both")
+    header = ["hp", "ambient_c", "fasl"] + list(fields)
+    values = row_formatter(header, fields)
+    try:
+        from batch import size_batch, _require_numpy
+        _require_numpy()
+    except RuntimeError:
+        size_batch = None
+
+    out = {}
+    for n in opts.sizes:
+        rows = _synthetic_rows(n, tables)
+        rep = opts.repeat if n <= 100000 else 1
+
+        def stream(memo=None):
+            for r in size_rows(rows, tables, "both", memo=memo):
+                values(r)
+
+        res = {
+            "stream": _time(stream, rep),
+            "stream_memo": _time(lambda: stream(ResultCache()), rep),
+        }
+        if size_batch is not None:
+            import numpy as np
+            hp = np.array([r["hp"] for r in rows], dtype=float)
+            amb = np.array([np.nan if r["ambient_c"] is None else r["ambient_c"] for r in rows])
+            alt = np.array([np.nan if r["fasl"] is None else r["fasl"] for r in rows])
+            res["numpy"] = _time(lambda: size_batch(hp, amb, alt, tables), rep)
+        for v in res.values():
+            v["rows_per_s"] = round(n / (v["best_ms"] / 1000.0)) if v["best_ms"] else 0
+        out[str(n)] = res
+    return out
+
+
+def _meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": sys.version.split()[0],
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def _flatten(d, prefix=""):
+    for k, v in d.items():
+        if isinstance(v, dict):
+            yield from _flatten(v, f"{prefix}{k}.")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield f"{prefix}{k}", v
+
+
+def compare(results, baseline, threshold=1.2):
+    """Imprime nuevo/base de cada métrica *_ms; devuelve las que empeoraron más de threshold."""
+    worse = []
+    for name, res in results.items():
+        old = dict(_flatten(baseline.get(name, {})))
+        for metric, v in _flatten(res):
+            if not metric.endswith("_ms") or not old.get(metric):
+                continue
+            ratio = v / old[metric]
+            flag = "  <-- más lento" if ratio > threshold else ""
+            print(f"  {name}.{metric}: {old[metric]:.3f} -> {v:.3f} ms (x{ratio:.2f}){flag}")
+            if flag:
+                worse.append(f"{name}.{metric}")
+    return worse
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("names", nargs="*", help=f"benchmarks a correr (por defecto todos: {', '.join(BENCHES)})")
+    ap.add_argument("--json", help="escribe los resultados en este archivo")
+    ap.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--xlsx", default=str(BUNDLED_XLSX), help="libro para tables/lookups/sizing")
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                    help="filas sintéticas para sizing, separadas por comas")
+    ap.add_argument("--repeat", type=int, default=5, help="repeticiones por medición")
+    args = ap.parse_args(argv)
+    args.sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+
+    results = {}
+    for name in args.names or list(BENCHES):
+        if name not in BENCHES:
+            ap.error(f"benchmark desconocido: {name}")
+        results[name] = BENCHES[name](args)
+        print(f"{name}: {json.dumps(results[name])}")
+    ok = all(r.get("ok", True) for r in results.values())
+    if args.json:
+        Path(args.json).write_text(json.dumps(dict(results, _meta=_meta()), indent=2), encoding="utf-8")
+    if args.compare:
+        print(f"comparado con {args.compare}:")
+        compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,451 @@
+# engine.py
+# Fórmulas de los bloques AZUL (I2/Q2, A4:B22) y NARANJA (I8/Q8, R3:S14) sin Tkinter.
+
+"""Headless calculation engine for the blue and orange blocks.
+
+``compute_blue`` and ``compute_orange`` take plain numbers plus a table
+snapshot (anything with ``blue``, ``orange`` and ``nema`` attributes, see
+``excel_tables.TableSnapshot``) and return result records.  Blank cells
+are ``None``; NEMA cells hold a step in HP or the ``">800 HP"`` marker.
+NEMA rounding goes through :class:`NemaTable` and the A4:B22/R3:S14
+lookups through :class:`LookupTable`, both built once per table load.
+``compute_site`` runs a motor through both derating stages at once.
+:class:`ResultCache` memoizes whole records for repeated inputs;
+:func:`formatter` and :func:`fmt_column` produce ``fmt``'s text in bulk.
+"""
+
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from typing import NamedTuple, Optional, Union
+
+HP_PER_KW = 1.341
+BLANK = " "
+
+F_50HZ = 1.15   # L2, AE2, L8, AE8
+F_EC = 0.94     # AB2, AH2, AB8, AH8
+
+Nema = Union[float, str, None]
+
+# exact: coincidencia exacta (por defecto, como la hoja)
+# floor: VLOOKUP(...; VERDADERO), la mayor clave <= x
+# nearest: la clave más cercana (empate -> la mayor)
+# linear: interpolación lineal entre claves vecinas, sin extrapolar
+LOOKUP_MODES = ("exact", "floor", "nearest", "linear")
+
+
+# ---------- utilidades ----------
+def to_kw(hp: float) -> float:
+    return hp / HP_PER_KW
+
+def to_watts(hp: float) -> float:
+    return to_kw(hp) * 1000.0
+
+def fmt(v, nd=2):
+    if v.__class__ is float:  # el caso común, sin try
+        return f"{v:.{nd}f}".rstrip("0").rstrip(".")
+    if v == BLANK or v is None:
+        return BLANK
+    try:
+        s = f"{float(v):.{nd}f}".rstrip("0").rstrip(".")
+        return s
+    except Exception:
+        return str(v)
+
+
+# ---------- NEMA ----------
+class NemaTable:
+    """Validated, sorted NEMA steps (H3:H30) searched with ``bisect_left``.
+
+    Behaves as a read-only sequence of floats, so it can stand in wherever
+    a plain list of steps was used.
+    """
+    __slots__ = ("steps", "overflow")
+
+    def __init__(self, steps=()):
+        vals = []
+        for s in steps:
+            try:
+                vals.append(float(s))
+            except Exception:
+                pass
+        self.steps = array("d", sorted(set(vals)))
+        self.overflow = f">{int(self.steps[-1])} HP" if self.steps else ">800 HP"
+
+    def pick(self, x):
+        """Menor paso >= x; BLANK si x <= 0, la etiqueta ">N HP" si excede."""
+        if x is None or x <= 0:
+            return BLANK
+        steps = self.steps
+        i = bisect_left(steps, x)
+        return steps[i] if i < len(steps) and x <= steps[i] else self.overflow
+
+    def pick_many(self, xs):
+        return [self.pick(x) for x in xs]
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __getitem__(self, i):
+        return self.steps[i]
+
+    def __eq__(self, other):
+        return list(self) == list(other) if isinstance(other, (NemaTable, list, tuple)) else NotImplemented
+
+    def __reduce__(self):
+        return (NemaTable, (tuple(self.steps),))
+
+    def __repr__(self):
+        return f"NemaTable({list(self.steps)})"
+
+
+# ---------- VLOOKUP ----------
+class LookupTable(Mapping):
+    """Read-only ``{key: %}`` table (A4:B22 or R3:S14) with sorted key/value
+    arrays for the floor, nearest and linear lookup modes."""
+    __slots__ = ("_d", "xs", "ys")
+
+    def __init__(self, pairs=()):
+        self._d = dict(pairs)
+        ks = sorted(self._d)
+        self.xs = array("d", ks)
+        self.ys = array("d", (self._d[k] for k in ks))
+
+    def lookup(self, x, mode="exact"):
+        """% para la clave x según el modo; None si no hay valor."""
+        if x is None or x != x:
+            return None
+        if mode == "exact":
+            return self._d.get(x)
+        if mode not in LOOKUP_MODES:
+            raise ValueError(f"Modo de búsqueda desconocido: {mode}")
+        xs, ys = self.xs, self.ys
+        if not xs or not (xs[0] <= x <= xs[-1] or mode in ("floor", "nearest")):
+            return None
+        i = bisect_right(xs, x)  # xs[i-1] <= x < xs[i]
+        if mode == "floor":
+            return ys[i - 1] if i else None
+        if i == 0:
+            return ys[0] if mode == "nearest" else None
+        if i == len(xs) or xs[i - 1] == x:
+            return ys[i - 1]
+        x0, x1 = xs[i - 1], xs[i]
+        if mode == "nearest":
+            return ys[i] if x - x0 >= x1 - x else ys[i - 1]
+        return ys[i - 1] + (ys[i] - ys[i - 1]) * (x - x0) / (x1 - x0)
+
+    def __getitem__(self, k):
+        return self._d[k]
+
+    def __iter__(self):
+        return iter(self._d)
+
+    def __len__(self):
+        return len(self._d)
+
+    def __reduce__(self):
+        return (LookupTable, (list(self._d.items()),))
+
+    def __repr__(self):
+        return f"LookupTable({self._d})"
+
+
+def as_lookup_table(table):
+    return table if isinstance(table, LookupTable) else LookupTable(table.items())
+
+def as_nema_table(steps):
+    return steps if isinstance(steps, NemaTable) else NemaTable(steps)
+
+def pick_nema_hp(x, steps):
+    return as_nema_table(steps).pick(x)
+
+def _nema(x, nema) -> Nema:
+    v = nema.pick(x)
+    return None if v == BLANK else v
+
+
+# ---------- registros ----------
+class BlueResult(NamedTuple):
+    i2: Optional[float] = None       # HP
+    i3: Optional[float] = None       # kW = I2/1.341
+    i4: Optional[float] = None       # W = I3*1000
+    l2: Optional[float] = None       # I2*1.15
+    l3: Nema = None                  # NEMA(L2)
+    q2: Optional[float] = None       # ambiente °C
+    u2: Optional[float] = None       # VLOOKUP(A4:B22)/100
+    y2: Optional[float] = None       # I2/U2
+    y2_kw: Optional[float] = None    # Y3
+    y2_w: Optional[float] = None     # Y4
+    y2_nema: Nema = None
+    ab2: Optional[float] = None      # Y2*0.94
+    ab3: Nema = None
+    ae2: Optional[float] = None      # Y2*1.15
+    ae3: Nema = None
+    ah2: Optional[float] = None      # AE2*0.94
+    ah3: Nema = None
+
+
+class OrangeResult(NamedTuple):
+    i8: Optional[float] = None       # HP
+    i9: Optional[float] = None       # kW = I8/1.341
+    i10: Optional[float] = None      # W = I9*1000
+    l8: Optional[float] = None       # I8*1.15
+    l9: Nema = None                  # NEMA(L8)
+    q8: Optional[float] = None       # FASL/MASL
+    u8: Optional[float] = None       # VLOOKUP(R3:S14)/100
+    y8: Optional[float] = None       # I8/U8
+    y8_kw: Optional[float] = None
+    y8_w: Optional[float] = None
+    y8_nema: Nema = None
+    ab8: Optional[float] = None      # Y8*0.94
+    ab9: Nema = None
+    ae8: Optional[float] = None      # Y8*1.15
+    ae9: Nema = None
+    ah8: Optional[float] = None      # AE8*0.94
+    ah9: Nema = None
+
+
+class SiteResult(NamedTuple):
+    """Sitio con ambiente (A4:B22) y altitud (R3:S14) a la vez, en una pasada."""
+    s_hp: Optional[float] = None     # HP base
+    s_kw: Optional[float] = None
+    s_w: Optional[float] = None
+    s_l: Optional[float] = None      # HP*1.15
+    s_l_nema: Nema = None
+    s_amb: Optional[float] = None    # °C
+    s_u_amb: Optional[float] = None  # A4:B22/100
+    s_alt: Optional[float] = None    # FASL/MASL
+    s_u_alt: Optional[float] = None  # R3:S14/100
+    s_u: Optional[float] = None      # u_amb*u_alt (producto) o min (peor caso)
+    s_y: Optional[float] = None      # HP/U
+    s_y_kw: Optional[float] = None
+    s_y_w: Optional[float] = None
+    s_y_nema: Nema = None
+    s_ab: Optional[float] = None     # Y*0.94
+    s_ab_nema: Nema = None
+    s_ae: Optional[float] = None     # Y*1.15
+    s_ae_nema: Nema = None
+    s_ah: Optional[float] = None     # AE*0.94
+    s_ah_nema: Nema = None
+
+
+# Campos que se muestran con 3 decimales; el resto con 2
+PRECISION = {"u2": 3, "u8": 3, "s_u_amb": 3, "s_u_alt": 3, "s_u": 3}
+# Columnas NEMA (paso en HP o la etiqueta de desborde)
+NEMA_FIELDS = frozenset(k for rec in (BlueResult, OrangeResult, SiteResult)
+                        for k, t in rec.__annotations__.items() if t == Nema)
+
+# Cómo se combinan las dos fracciones de carga de un sitio
+SITE_RULES = {
+    "product": lambda ua, ub: ua * ub,  # las dos reducciones se acumulan
+    "worst": min,                       # solo cuenta la más severa
+}
+
+
+# ---------- formato en bloque ----------
+INF = float("inf")
+FMT_CACHE = 65536  # textos memorizados por precisión antes de empezar de cero
+_FORMATTERS = {}
+
+def formatter(nd=2):
+    """``fmt`` con la precisión fija y memo valor -> texto (mismas cadenas que ``fmt``).
+
+    Pensado para lotes: los catálogos repiten las mismas potencias, así que
+    casi todos los valores salen de un dict.  Si el memo se llena casi sin
+    aciertos (valores todos distintos) se salta durante un rato y luego se
+    vuelve a probar.  Uno por precisión, compartido.
+    """
+    f = _FORMATTERS.get(nd)
+    if f is not None:
+        return f
+    spec, memo, st = f".{nd}f", {}, [0, 0]  # [aciertos desde el último vaciado, llamadas sin memo pendientes]
+
+    def f(v):
+        if v.__class__ is not float or not v:  # BLANK, ">800 HP", enteros; 0.0/-0.0 son iguales como clave
+            return fmt(v, nd)
+        if st[1]:
+            st[1] -= 1
+            return format(v, spec).rstrip("0").rstrip(".")
+        s = memo.get(v)
+        if s is not None:
+            st[0] += 1
+            return s
+        if len(memo) >= FMT_CACHE:
+            if st[0] < FMT_CACHE:  # menos de un acierto por entrada: no compensa
+                st[1] = 16 * FMT_CACHE
+            st[0] = 0
+            memo.clear()
+        s = memo[v] = format(v, spec).rstrip("0").rstrip(".")
+        return s
+    return _FORMATTERS.setdefault(nd, f)
+
+def field_formatters(fields):
+    """{campo: formateador} según PRECISION."""
+    return {k: formatter(PRECISION.get(k, 2)) for k in fields}
+
+def fmt_column(values, nd=2, inf=None):
+    """Lista de textos para una columna entera; NaN (celda vacía en un array) -> BLANK.
+
+    ``inf`` reemplaza el texto de +inf (la etiqueta de desborde NEMA en las
+    columnas de ``batch.size_batch``).  Con un ``numpy.ndarray`` de floats
+    cada valor distinto se formatea una sola vez (``np.unique`` + índice
+    inverso); otras secuencias pasan por :func:`formatter`.
+    """
+    f = formatter(nd)
+    if inf is not None:
+        f = (lambda g: lambda v: inf if v == INF else g(v))(f)
+    dtype = getattr(values, "dtype", None)
+    if dtype is None or dtype.kind != "f":
+        return [BLANK if v != v else f(v) for v in values]
+    import numpy as np  # quien pasa un ndarray ya lo tiene
+    uniq, inv = np.unique(values, return_inverse=True)
+    texts = np.array([BLANK if u != u else f(u) for u in uniq.tolist()], dtype=object)
+    return texts[inv.reshape(-1)].tolist()
+
+
+# ---------- cálculos ----------
+def _derate(hp, load_pct, nema):
+    """Base, 50 Hz, nueva potencia y tolerancias comunes a ambos bloques."""
+    return _derate_u(hp, None if load_pct is None else load_pct / 100.0, nema)
+
+def _derate_u(hp, u, nema):
+    base_ok = bool(hp)
+    base = (hp, to_kw(hp), to_watts(hp)) if base_ok else (None, None, None)
+    l = hp * F_50HZ if base_ok else None
+    if not base_ok or u is None:
+        return base + (l, _nema(l, nema), u) + (None,) * 10
+    y = hp / u
+    ab = y * F_EC
+    ae = y * F_50HZ
+    ah = ae * F_EC
+    return base + (l, _nema(l, nema), u,
+                   y, to_kw(y), to_watts(y), _nema(y, nema),
+                   ab, _nema(ab, nema), ae, _nema(ae, nema), ah, _nema(ah, nema))
+
+def compute_blue(hp, ambient_c, tables, mode="exact") -> BlueResult:
+    """Bloque AZUL: HP (I2) y ambiente °C (Q2) buscado en A4:B22 según ``mode``."""
+    pct = as_lookup_table(tables.blue).lookup(ambient_c, mode)
+    v = _derate(hp, pct, as_nema_table(tables.nema))
+    return BlueResult(*v[:5], ambient_c, *v[5:])
+
+def compute_orange(hp, fasl, tables, mode="exact") -> OrangeResult:
+    """Bloque NARANJA: HP base (I8) y FASL/MASL (Q8) buscado en R3:S14 según ``mode``."""
+    pct = as_lookup_table(tables.orange).lookup(fasl, mode)
+    v = _derate(hp, pct, as_nema_table(tables.nema))
+    return OrangeResult(*v[:5], fasl, *v[5:])
+
+def _site_factor(table, key, mode):
+    # sin clave la condición no aplica (1.0); clave fuera de la tabla -> None (celdas vacías)
+    if key is None:
+        return 1.0
+    pct = as_lookup_table(table).lookup(key, mode)
+    return None if pct is None else pct / 100.0
+
+def compute_site(hp, ambient_c, fasl, tables, mode="exact", rule="product") -> SiteResult:
+    """Ambiente (A4:B22) y altitud (R3:S14) sobre el mismo HP, combinados según ``rule``.
+
+    ``product`` multiplica las dos fracciones de carga; ``worst`` usa la
+    menor.  Una condición sin dato (None) no reduce nada.
+    """
+    if rule not in SITE_RULES:
+        raise ValueError(f"Regla de sitio desconocida: {rule}")
+    ua = _site_factor(tables.blue, ambient_c, mode)
+    ub = _site_factor(tables.orange, fasl, mode)
+    u = None if ua is None or ub is None else SITE_RULES[rule](ua, ub)
+    v = _derate_u(hp, u, as_nema_table(tables.nema))
+    return SiteResult(*v[:5], ambient_c, None if ambient_c is None else ua,
+                      fasl, None if fasl is None else ub, *v[5:])
+
+
+# ---------- memoización ----------
+class ResultCache:
+    """Bounded memo of blue/orange records keyed by the inputs and the table version.
+
+    The version is the identity of the snapshot (and of the formula model,
+    if any) passed in, so loading new tables starts a new set of keys
+    without an explicit invalidation; the old entries age out.  When the
+    cache is full the oldest entry is dropped.  Hits are a plain dict probe.
+    """
+
+    def __init__(self, maxsize=65536, max_versions=16):
+        self.maxsize = maxsize
+        self.max_versions = max_versions
+        self._d = {}
+        self._ids = {}  # id(objeto) -> (objeto, versión); la referencia evita que se reutilice el id
+        self._n = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _version(self, obj):
+        if obj is None:
+            return 0
+        v = self._ids.get(id(obj))
+        if v is not None and v[0] is obj:
+            return v[1]
+        with self._lock:
+            if len(self._ids) >= self.max_versions:
+                self._clear()
+            self._n += 1
+            self._ids[id(obj)] = (obj, self._n)
+            return self._n
+
+    def compute(self, block, hp, key, tables, mode="exact", model=None):
+        """compute_blue/compute_orange (o los del modelo de fórmulas) con memo.
+
+        Para ``block="site"`` la clave es ``(ambiente, FASL, regla)``.
+        """
+        k = (block, hp, key, mode, self._version(tables), self._version(model))
+        r = self._d.get(k)
+        if r is not None:
+            self.hits += 1
+            return r
+        self.misses += 1
+        if block == "site":
+            return self._store(k, compute_site(hp, *key[:2], tables, mode, key[2]))
+        if model is None:
+            fn = compute_blue if block == "blue" else compute_orange
+        else:
+            fn = model.compute_blue if block == "blue" else model.compute_orange
+        return self._store(k, fn(hp, key, tables, mode))
+
+    def _store(self, k, r):
+        if self.maxsize > 0:
+            with self._lock:
+                if len(self._d) >= self.maxsize:
+                    del self._d[next(iter(self._d))]
+                    self.evictions += 1
+                self._d[k] = r
+        return r
+
+    def compute_blue(self, hp, ambient_c, tables, mode="exact", model=None) -> BlueResult:
+        return self.compute("blue", hp, ambient_c, tables, mode, model)
+
+    def compute_orange(self, hp, fasl, tables, mode="exact", model=None) -> OrangeResult:
+        return self.compute("orange", hp, fasl, tables, mode, model)
+
+    def compute_site(self, hp, ambient_c, fasl, tables, mode="exact", rule="product") -> SiteResult:
+        return self.compute("site", hp, (ambient_c, fasl, rule), tables, mode)
+
+    def _clear(self):
+        self._d.clear()
+        self._ids.clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        n = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._d), "hit_rate": round(self.hits / n, 4) if n else 0.0}
+
+    def __reduce__(self):
+        # a otro proceso viaja vacío (solo la configuración)
+        return (ResultCache, (self.maxsize, self.max_versions))
+
+    def __len__(self):
+        return len(self._d)
@@ -0,0 +1,504 @@
+# excel_tables.py
+# Lectura de las tablas de la hoja "cm electrico": A4:B22, R3:S14 y H3:H30.
+
+"""Workbook loader for the blue/orange lookup tables and NEMA steps.
+
+``read_tables`` opens the workbook once and streams only the bounding box
+of the three ranges, returning an immutable :class:`TableSnapshot`.  It
+reads rows 3-30 straight from the sheet XML and stops there, so the
+workbook's stylesheet (thousands of named styles, seconds in openpyxl) is
+never built; anything only openpyxl reads the same way (date-formatted
+cells, malformed values) goes through ``iter_rows(values_only=True)``
+instead, and ``python excel_tables.py`` checks both paths agree.  ``changed_ranges`` compares two
+snapshots range by range (watcher.py).
+
+``load_tables`` puts a small JSON cache in front of it, keyed by path,
+sheet, mtime and size (plus an optional SHA-256 of the file), so a warm
+start never imports openpyxl.  ``load_cached`` is the generic form used for
+anything else derived from the workbook (e.g. the formulas in formulas.py).
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple
+
+from engine import LookupTable, NemaTable
+from instrument import count, span
+
+DEFAULT_SHEET = "cm electrico"
+
+# Rangos fijos según tu hoja
+# Azul -> A4:B22  (°C -> %)
+A_COL, A_R0, B_COL, B_R1 = "A", 4, "B", 22
+# Naranja -> R3:S14 (FASL/MASL -> %)
+R_COL, R_R0, S_COL, S_R1 = "R", 3, "S", 14
+# NEMA -> H3:H30 (pasos en HP)
+NEMA_COL, NEMA_R0, NEMA_R1 = "H", 3, 30
+
+FALLBACK_NEMA = [1,1.5,2,3,5,7.5,10,15,20,25,30,40,50,60,75,100,125,150,200,250,300,350,400,450,500,600,700,800]
+
+
+class TableSnapshot(NamedTuple):
+    """Read-only view of the three ranges loaded from one sheet."""
+    blue: LookupTable    # A4:B22 (°C -> %)
+    orange: LookupTable  # R3:S14 (FASL/MASL -> %)
+    nema: NemaTable      # H3:H30 ordenado, sin duplicados
+
+
+def make_snapshot(blue, orange, nema):
+    return TableSnapshot(LookupTable(dict(blue).items()), LookupTable(dict(orange).items()), NemaTable(nema))
+
+
+EMPTY_TABLES = make_snapshot({}, {}, FALLBACK_NEMA)
+
+# campo del snapshot -> rango de la hoja
+RANGES = {
+    "blue": f"{A_COL}{A_R0}:{B_COL}{B_R1}",
+    "orange": f"{R_COL}{R_R0}:{S_COL}{S_R1}",
+    "nema": f"{NEMA_COL}{NEMA_R0}:{NEMA_COL}{NEMA_R1}",
+}
+
+def changed_ranges(old, new):
+    """Rangos ("A4:B22", "R3:S14", "H3:H30") cuyo contenido difiere entre dos snapshots."""
+    return tuple(r for f, r in RANGES.items() if getattr(old, f) != getattr(new, f))
+
+# Caché compilada junto al perfil del usuario
+CACHE_PATH = Path.home() / ".cm_analisis" / "tablas_cache.json"
+CACHE_VERSION = 2
+
+
+# ---------- lectura ----------
+def col_index(col: str) -> int:
+    """'A' -> 1, 'S' -> 19, 'AB' -> 28."""
+    n = 0
+    for ch in col.upper():
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+def _open_sheet(path, sheet, data_only=True):
+    with span("openpyxl.import"):
+        try:
+            import openpyxl  # solo cuando hay que parsear el libro
+        except Exception:
+            raise RuntimeError("Instala openpyxl: pip install openpyxl")
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"No se encontró el archivo: {p}")
+    with span("excel.abrir", archivo=p.name, bytes=p.stat().st_size):
+        wb = openpyxl.load_workbook(p, data_only=data_only, read_only=True)
+    with span("excel.hoja", hoja=sheet):
+        if sheet not in wb.sheetnames:
+            match = [s for s in wb.sheetnames if s.lower() == sheet.lower()]
+            if not match:
+                wb.close()
+                raise KeyError(f"No existe la hoja '{sheet}'. Hojas: {wb.sheetnames}")
+            sheet = match[0]
+        return wb, wb[sheet]
+
+def _cell(row, i):
+    return row[i] if i < len(row) else None
+
+def _put_pair(out, k, v):
+    if k is None or v is None:
+        return
+    try:
+        out[float(k)] = float(v)
+    except Exception:
+        pass
+
+def _nema_from(vals):
+    out = []
+    for v in vals:
+        try:
+            out.append(float(v))
+        except Exception:
+            pass
+    return sorted(set(out)) or FALLBACK_NEMA[:]
+
+# ---------- lectura directa del XML ----------
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+_DATE_FMT_IDS = frozenset(range(14, 23)) | {45, 46, 47}
+
+class _NotPlain(Exception):
+    """El rango necesita a openpyxl (p. ej. celdas con formato de fecha)."""
+
+class _NoSheet(KeyError):
+    """La hoja no está en xl/workbook.xml (openpyxl tampoco la encontraría)."""
+
+def _sheet_part(zf, sheet):
+    import xml.etree.ElementTree as ET
+    rid, names = None, []
+    for el in ET.fromstring(zf.read("xl/workbook.xml")).iter(_NS + "sheet"):
+        names.append(el.get("name", ""))
+        if rid is None and names[-1].lower() == sheet.lower():
+            rid = el.get(_REL)
+        if names[-1] == sheet:
+            rid = el.get(_REL)
+    if rid is None:
+        raise _NoSheet(f"No existe la hoja '{sheet}'. Hojas: {names}")
+    for el in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")).iter(_PKG_REL):
+        if el.get("Id") == rid:
+            target = el.get("Target")
+            return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise _NotPlain(rid)
+
+def _shared_strings(zf):
+    import xml.etree.ElementTree as ET
+    try:
+        root = ET.fromstring(zf.read("xl/sharedStrings.xml"))
+    except KeyError:
+        return []
+    return [_text(si) for si in root.iter(_NS + "si")]
+
+def _text(el):
+    # texto plano + el de cada tramo con formato (<r>), sin las guías fonéticas, como openpyxl
+    return (el.findtext(_NS + "t") or "") + "".join(r.findtext(_NS + "t") or "" for r in el.findall(_NS + "r"))
+
+def _date_styles(zf):
+    """Índices de cellXfs cuyo formato numérico es (o podría ser) de fecha."""
+    import re
+    import xml.etree.ElementTree as ET
+    custom, out = {}, set()
+    try:
+        f = zf.open("xl/styles.xml")
+    except KeyError:
+        return frozenset()
+    with f:
+        # numFmts va antes que cellXfs; lo que sigue (cellStyles, dxfs...) no hace falta
+        for _, el in ET.iterparse(f):
+            if el.tag == _NS + "numFmt":
+                code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', "", el.get("formatCode", ""))
+                custom[int(el.get("numFmtId", 0))] = bool(re.search("[dmyhs]", code, re.I))
+            elif el.tag == _NS + "cellXfs":
+                for i, xf in enumerate(el.iter(_NS + "xf")):
+                    fid = int(xf.get("numFmtId", 0))
+                    if fid in _DATE_FMT_IDS or custom.get(fid, False):
+                        out.add(i)
+                break
+            elif el.tag == _NS + "cellStyleXfs":
+                el.clear()
+    return frozenset(out)
+
+def _read_box_xml(path, sheet, r0, r1, c0, c1):
+    """Filas r0..r1 (columnas c0..c1, valores como iter_rows(values_only=True)) leídas
+    directamente del XML de la hoja, sin cargar los estilos del libro.
+
+    Se detiene al pasar r1.  Lanza _NotPlain si hay algo que solo openpyxl
+    interpreta igual (fechas...) y _NoSheet (un KeyError) si la hoja no existe.
+    """
+    import xml.etree.ElementTree as ET
+    import zipfile
+    width = c1 - c0 + 1
+    box = [[None] * width for _ in range(r1 - r0 + 1)]
+    sst = dates = None
+    with zipfile.ZipFile(path) as zf, zf.open(_sheet_part(zf, sheet)) as f:
+        n = 0
+        for _, el in ET.iterparse(f):
+            if el.tag != _NS + "row":
+                continue
+            n = int(el.get("r") or n + 1)
+            if n > r1:
+                break
+            if n >= r0:
+                row, col = box[n - r0], 0
+                for c in el.iter(_NS + "c"):
+                    ref = c.get("r")
+                    col = col_index(ref.rstrip("0123456789")) if ref else col + 1
+                    if not c0 <= col <= c1:
+                        continue
+                    t, v = c.get("t", "n"), c.findtext(_NS + "v")
+                    if t == "inlineStr":
+                        is_ = c.find(_NS + "is")
+                        row[col - c0] = _text(is_) if is_ is not None else None
+                    elif not v:
+                        continue  # sin <v> o <v/> vacío (fórmula sin valor guardado): celda en blanco
+                    elif t == "n":
+                        if c.get("s"):
+                            if dates is None:
+                                dates = _date_styles(zf)
+                            if int(c.get("s")) in dates:
+                                raise _NotPlain("fecha")
+                        row[col - c0] = float(v) if "." in v or "E" in v or "e" in v else int(v)
+                    elif t == "s":
+                        if sst is None:
+                            sst = _shared_strings(zf)
+                        row[col - c0] = sst[int(v)]
+                    elif t == "b":
+                        row[col - c0] = bool(int(v))
+                    elif t in ("str", "e"):
+                        row[col - c0] = v
+                    else:
+                        raise _NotPlain(t)  # t="d" (fecha ISO)
+            el.clear()
+    return box
+
+
+_XML_SUFFIXES = (".xlsx", ".xlsm", ".xltx", ".xltm")
+
+@contextmanager
+def _box(path, sheet, r0, r1, c0, c1, label):
+    """Filas r0..r1 de las columnas c0..c1: del XML si se puede; si no, iter_rows de openpyxl."""
+    rows = None
+    if Path(path).suffix.lower() in _XML_SUFFIXES:
+        import xml.etree.ElementTree as ET
+        import zipfile
+        try:
+            with span("excel.xml", rango=label):
+                rows = _read_box_xml(path, sheet, r0, r1, c0, c1)
+        except _NoSheet:
+            raise  # con la lista de hojas; openpyxl tardaría segundos en decir lo mismo
+        except (_NotPlain, KeyError, IndexError, ValueError, zipfile.BadZipFile, ET.ParseError):
+            rows = None  # fechas, partes que faltan, valores raros, ZIP o XML dañado: openpyxl decide
+    if rows is not None:
+        yield rows
+        return
+    wb, ws = _open_sheet(path, sheet)
+    try:
+        yield ws.iter_rows(min_row=r0, max_row=r1, min_col=c0, max_col=c1, values_only=True)
+    finally:
+        wb.close()
+
+
+def read_two_col_dict(path, sheet, col_key, r0, col_val, r1):
+    """Lee un par de columnas numéricas a dict {key: val}."""
+    ck, cv = col_index(col_key), col_index(col_val)
+    c0, c1 = min(ck, cv), max(ck, cv)
+    out = {}
+    with _box(path, sheet, r0, r1, c0, c1, f"{col_key}{r0}:{col_val}{r1}") as rows:
+        with span(f"excel.{col_key}{r0}:{col_val}{r1}"):
+            for row in rows:
+                _put_pair(out, _cell(row, ck - c0), _cell(row, cv - c0))
+    count("celdas leídas", (r1 - r0 + 1) * (c1 - c0 + 1))
+    return out
+
+def read_nema_steps(path, sheet, col="H", r0=3, r1=30):
+    c = col_index(col)
+    with _box(path, sheet, r0, r1, c, c, f"{col}{r0}:{col}{r1}") as rows:
+        with span(f"excel.{col}{r0}:{col}{r1}"):
+            steps = _nema_from(_cell(row, 0) for row in rows)
+    count("celdas leídas", r1 - r0 + 1)
+    return steps
+
+def read_tables(path, sheet=DEFAULT_SHEET):
+    """Lee A4:B22, R3:S14 y H3:H30 en una sola apertura y una sola pasada.
+
+    Primero directamente del XML de la hoja (sin estilos: milisegundos en
+    vez de segundos en libros con miles de estilos); si el libro tiene algo
+    que solo openpyxl interpreta igual, con openpyxl en modo solo lectura.
+    """
+    a, b = col_index(A_COL), col_index(B_COL)
+    r, s = col_index(R_COL), col_index(S_COL)
+    h = col_index(NEMA_COL)
+    c0, c1 = min(a, b, r, s, h), max(a, b, r, s, h)
+    r0, r1 = min(A_R0, R_R0, NEMA_R0), max(B_R1, S_R1, NEMA_R1)
+
+    with _box(path, sheet, r0, r1, c0, c1, f"{A_COL}{r0}:{S_COL}{r1}") as rows:
+        blue, orange, nema = {}, {}, []
+        with span("excel.rangos", rango=f"{A_COL}{r0}:{S_COL}{r1}"):
+            for n, row in enumerate(rows, start=r0):
+                if A_R0 <= n <= B_R1:
+                    _put_pair(blue, _cell(row, a - c0), _cell(row, b - c0))
+                if R_R0 <= n <= S_R1:
+                    _put_pair(orange, _cell(row, r - c0), _cell(row, s - c0))
+                if NEMA_R0 <= n <= NEMA_R1:
+                    nema.append(_cell(row, h - c0))
+    count("celdas leídas", (r1 - r0 + 1) * (c1 - c0 + 1))
+    return make_snapshot(blue, orange, _nema_from(nema))
+
+
+# ---------- caché ----------
+def _cache_key(path, sheet, kind):
+    return f"{kind}|{Path(path).resolve()}|{sheet.lower()}"
+
+def _file_hash(path):
+    import hashlib  # diferido: _hashlib carga OpenSSL
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _read_cache(cache_path):
+    import json  # diferido: solo la carga (en segundo plano) lo necesita
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == CACHE_VERSION:
+            return data
+    except Exception:
+        pass
+    return {"version": CACHE_VERSION, "entries": {}}
+
+def _write_cache(cache_path, data):
+    # best effort: una caché que no se puede escribir no debe romper la carga
+    import json
+    try:
+        cache_path = Path(cache_path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, cache_path)
+    except Exception:
+        pass
+
+def invalidate_cache(path=None, sheet=None, cache_path=None):
+    """Borra las entradas de (path, sheet) de la caché, o toda la caché si path es None."""
+    cache_path = cache_path or CACHE_PATH
+    if path is None:
+        try:
+            os.remove(cache_path)
+        except FileNotFoundError:
+            pass
+        return
+    data = _read_cache(cache_path)
+    suffix = _cache_key(path, sheet or DEFAULT_SHEET, "")
+    stale = [k for k in data["entries"] if k.endswith(suffix)]
+    for k in stale:
+        del data["entries"][k]
+    if stale:
+        _write_cache(cache_path, data)
+
+def load_cached(path, sheet, kind, build, use_cache=True, check_hash=False, cache_path=None):
+    """Devuelve ``(payload, from_cache)`` para ``build(path, sheet)``.
+
+    ``payload`` debe ser serializable a JSON; se guarda bajo ``kind`` junto
+    con mtime, tamaño y SHA-256 del libro y se reutiliza mientras no cambien.
+    ``check_hash`` además compara el SHA-256 (útil en recursos de red que no
+    conservan mtime).
+    """
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"No se encontró el archivo: {p}")
+    cache_path = cache_path or CACHE_PATH
+    st = p.stat()
+    key = _cache_key(p, sheet, kind)
+    with span("caché.leer", tipo=kind):
+        data = _read_cache(cache_path) if use_cache else None
+
+    if data is not None:
+        e = data["entries"].get(key)
+        if (e and e.get("mtime_ns") == st.st_mtime_ns and e.get("size") == st.st_size
+                and (not check_hash or e.get("sha256") == _file_hash(p))):
+            count(f"caché aciertos ({kind})")
+            return e["payload"], True
+
+    count(f"caché fallos ({kind})")
+    payload = build(p, sheet)
+    if data is None:
+        data = _read_cache(cache_path)
+    with span("caché.sha256"):
+        digest = _file_hash(p)
+    data["entries"][key] = {
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha256": digest,
+        "payload": payload,
+    }
+    with span("caché.escribir", tipo=kind):
+        _write_cache(cache_path, data)
+    return payload, False
+
+def _tables_payload(path, sheet):
+    snap = read_tables(path, sheet)
+    return {"blue": list(snap.blue.items()), "orange": list(snap.orange.items()), "nema": list(snap.nema)}
+
+def load_tables(path, sheet=DEFAULT_SHEET, use_cache=True, check_hash=False, cache_path=None):
+    """Como read_tables, pero usa la caché si el libro no cambió.
+
+    Devuelve ``(snapshot, from_cache)``.
+    """
+    e, cached = load_cached(path, sheet, "tablas", _tables_payload, use_cache, check_hash, cache_path)
+    return make_snapshot(dict(e["blue"]), dict(e["orange"]), e["nema"]), cached
+
+
+# ---------- verificación ----------
+# Celdas que openpyxl no escribe por sí solo: texto en línea (con tramos y guía
+# fonética), <v/> vacíos, celdas y filas sin referencia
+_CHECK_ROWS = (
+    '<row r="3"><c r="A3" t="inlineStr"><is><t>en línea</t></is></c><c r="B3" t="s"><v/></c>'
+    '<c r="C3" t="inlineStr"><is><r><t>a</t></r><r><t>b</t></r><rPh sb="0" eb="1"><t>x</t></rPh></is></c>'
+    '<c t="n"><v>7</v></c><c r="E3" t="inlineStr"/></row>'
+    '<row><c r="A4" t="str"><v>calc</v></c><c r="B4" t="b"><v></v></c><c r="C4"><v></v></c>'
+    '<c r="D4" t="e"><v>#DIV/0!</v></c></row>'
+)
+
+def _trim(rows):
+    # openpyxl no rellena las filas que faltan al final de la hoja; el XML sí
+    rows = [list(r) for r in rows]
+    while rows and not any(v is not None for v in rows[-1]):
+        rows.pop()
+    return rows
+
+def self_check():
+    """Compara la lectura directa del XML con iter_rows de openpyxl en un libro
+    sintético: texto compartido y en línea, booleanos, errores, fórmulas sin
+    valor guardado, celdas vacías y fechas (que deben ir por openpyxl).
+
+    Devuelve la lista de fallos (vacía si todo cuadra).
+    """
+    import datetime
+    import shutil
+    import tempfile
+    import zipfile
+    import openpyxl
+
+    tmp = tempfile.mkdtemp()
+    try:
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Plano"
+        ws.append([1, 2.5, 1e-7, "texto", True, False])
+        ws.append(["=A1*2", None, "#N/A", 1e20, -3])
+        wb.create_sheet("Fechas").append([1, datetime.date(2024, 5, 1), "x"])
+        src = os.path.join(tmp, "src.xlsx")
+        wb.save(src)
+        path = os.path.join(tmp, "check.xlsx")
+        with zipfile.ZipFile(src) as zi, zipfile.ZipFile(path, "w") as zo:
+            for item in zi.infolist():
+                data = zi.read(item)
+                if item.filename == "xl/worksheets/sheet1.xml":
+                    data = data.replace(b"</sheetData>", _CHECK_ROWS.encode() + b"</sheetData>")
+                zo.writestr(item, data)
+
+        fails = []
+        for sheet, xml in (("Plano", True), ("plano", True), ("Fechas", False)):
+            wb, ws = _open_sheet(path, sheet)
+            try:
+                exp = _trim(ws.iter_rows(min_row=1, max_row=5, min_col=1, max_col=6, values_only=True))
+            finally:
+                wb.close()
+            try:
+                got = _trim(_read_box_xml(path, sheet, 1, 5, 1, 6))
+            except _NotPlain:
+                got = None
+            except Exception as e:
+                fails.append(f"{sheet}: el XML falló con {type(e).__name__}: {e}")
+                continue
+            if xml and got != exp:
+                fails.append(f"{sheet}: XML {got} != openpyxl {exp}")
+            if not xml and got is not None:
+                fails.append(f"{sheet}: las fechas deberían ir por openpyxl, el XML dio {got}")
+            with _box(path, sheet, 1, 5, 1, 6, "A1:F5") as rows:
+                got = _trim(rows)
+            if got != exp:
+                fails.append(f"{sheet}: _box {got} != openpyxl {exp}")
+        try:
+            _box(path, "nope", 1, 5, 1, 6, "A1:F5").__enter__()
+            fails.append("hoja inexistente sin error")
+        except KeyError as e:
+            if "Plano" not in str(e):
+                fails.append(f"hoja inexistente sin la lista de hojas: {e}")
+        return fails
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import sys
+    problems = self_check()
+    print("\n".join(problems) if problems else "lectura directa del XML == openpyxl: OK")
+    sys.exit(1 if problems else 0)
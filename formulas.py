@@ -0,0 +1,658 @@
+# formulas.py
+# Motor guiado por las fórmulas de la propia hoja: se leen, se compilan una vez y se evalúan en Python.
+
+"""Formula-driven engine for the blue and orange blocks.
+
+``read_formulas`` reads the "cm electrico" sheet with openpyxl *without*
+``data_only`` and keeps every formula string plus the constant cells.
+``FormulaModel`` parses the subset the sheet uses (arithmetic, comparisons,
+``&``, ``IF``, ``IFERROR``, ``VLOOKUP`` over A4:B22/R3:S14, ``MIN``, ``MAX``,
+``ROUND``, ``ABS`` and ``NEMA()`` for the H3:H30 rounding) into closures,
+orders the cells topologically and evaluates them for any inputs, so a
+revised workbook is followed without a code release.
+
+Output cells the workbook leaves empty (or whose formula falls outside the
+subset) use ``DEFAULT_FORMULAS``, which reproduce ``engine.compute_blue``/
+``compute_orange`` exactly; ``FormulaModel.warnings`` lists every fallback.
+``compute_blue``/``compute_orange`` have the same signature and records as
+the engine functions, so either can be plugged in.  ``python formulas.py``
+runs :func:`self_check`: the defaults against the engine over all lookup
+modes, plus the cycle, unsupported-function and workbook-formula paths.
+"""
+
+import math
+import re
+
+from engine import BLANK, BlueResult, OrangeResult, as_lookup_table, as_nema_table
+from excel_tables import DEFAULT_SHEET, _open_sheet, col_index, load_cached
+from instrument import count, span
+
+# Entradas de cada bloque (las escribe el usuario, no la hoja)
+BLUE_INPUTS = ("I2", "Q2")
+ORANGE_INPUTS = ("I8", "Q8")
+
+# campo del registro -> celda de la hoja
+BLUE_CELLS = dict(zip(BlueResult._fields, (
+    "I2", "I3", "I4", "L2", "L3", "Q2", "U2",
+    "Y2", "Y3", "Y4", "Y5", "AB2", "AB3", "AE2", "AE3", "AH2", "AH3")))
+ORANGE_CELLS = dict(zip(OrangeResult._fields, (
+    "I8", "I9", "I10", "L8", "L9", "Q8", "U8",
+    "Y8", "Y9", "Y10", "Y11", "AB8", "AB9", "AE8", "AE9", "AH8", "AH9")))
+
+# Rangos que VLOOKUP sabe resolver -> atributo del snapshot de tablas
+LOOKUP_RANGES = {"A4:B22": "blue", "R3:S14": "orange"}
+
+# Fórmulas equivalentes a engine.compute_blue/compute_orange
+DEFAULT_FORMULAS = {
+    "I3": '=IF(I2=0,"",I2/1.341)',
+    "I4": '=IF(I2=0,"",I3*1000)',
+    "L2": '=IF(I2=0,"",I2*1.15)',
+    "L3": "=NEMA(L2)",
+    "U2": "=VLOOKUP(Q2,A4:B22,2,FALSE)/100",
+    "Y2": '=IF(I2=0,"",I2/U2)',
+    "Y3": "=Y2/1.341",
+    "Y4": "=Y3*1000",
+    "Y5": "=NEMA(Y2)",
+    "AB2": "=Y2*0.94",
+    "AB3": "=NEMA(AB2)",
+    "AE2": "=Y2*1.15",
+    "AE3": "=NEMA(AE2)",
+    "AH2": "=AE2*0.94",
+    "AH3": "=NEMA(AH2)",
+    "I9": '=IF(I8=0,"",I8/1.341)',
+    "I10": '=IF(I8=0,"",I9*1000)',
+    "L8": '=IF(I8=0,"",I8*1.15)',
+    "L9": "=NEMA(L8)",
+    "U8": "=VLOOKUP(Q8,R3:S14,2,FALSE)/100",
+    "Y8": '=IF(I8=0,"",I8/U8)',
+    "Y9": "=Y8/1.341",
+    "Y10": "=Y9*1000",
+    "Y11": "=NEMA(Y8)",
+    "AB8": "=Y8*0.94",
+    "AB9": "=NEMA(AB8)",
+    "AE8": "=Y8*1.15",
+    "AE9": "=NEMA(AE8)",
+    "AH8": "=AE8*0.94",
+    "AH9": "=NEMA(AH8)",
+}
+
+# Zona de la hoja que se lee (fórmulas de los bloques y constantes a su alrededor)
+FORMULA_R1, FORMULA_C1 = 40, "AH"
+
+
+class FormulaError(Exception):
+    """Error de Excel (#N/A, #DIV/0!, #VALUE!...) durante la evaluación."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class FormulaSyntaxError(ValueError):
+    """La fórmula usa algo fuera del subconjunto soportado."""
+
+
+# ---------- lectura ----------
+def read_formulas(path, sheet=DEFAULT_SHEET):
+    """Devuelve ({celda: "=fórmula"}, {celda: constante}) de A1:AH40."""
+    wb, ws = _open_sheet(path, sheet, data_only=False)  # las fórmulas, no el último valor calculado
+    try:
+        formulas, values = {}, {}
+        rows = ws.iter_rows(min_row=1, max_row=FORMULA_R1, max_col=col_index(FORMULA_C1))
+        with span("excel.fórmulas"):
+            for row in rows:
+                for c in row:
+                    v = getattr(c, "value", None)
+                    if v is None:
+                        continue
+                    v = getattr(v, "text", v)  # ArrayFormula
+                    if isinstance(v, str) and v.startswith("="):
+                        formulas[c.coordinate] = v
+                    elif isinstance(v, (int, float, str, bool)):
+                        values[c.coordinate] = v
+        count("celdas leídas", FORMULA_R1 * col_index(FORMULA_C1))
+        return formulas, values
+    finally:
+        wb.close()
+
+def _formulas_payload(path, sheet):
+    formulas, values = read_formulas(path, sheet)
+    return {"formulas": formulas, "values": values}
+
+def load_model(path, sheet=DEFAULT_SHEET, use_cache=True, check_hash=False, cache_path=None):
+    """Lee (o toma de la caché) las fórmulas de la hoja y devuelve ``(FormulaModel, from_cache)``."""
+    e, cached = load_cached(path, sheet, "formulas", _formulas_payload, use_cache, check_hash, cache_path)
+    with span("fórmulas.compilar"):
+        return FormulaModel(e["formulas"], e["values"], sheet), cached
+
+
+# ---------- análisis léxico ----------
+_REF = r"\$?[A-Za-z]{1,3}\$?\d+"
+_TOKEN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<str>"(?:[^"]|"")*")
+  | (?P<ref>(?:(?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?""" + _REF + "(?::" + _REF + r""")?)(?![\w(])
+  | (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_][\w.]*)
+  | (?P<op><>|<=|>=|[-+*/^&%=<>(),])
+""", re.VERBOSE)
+
+def _tokens(src):
+    pos = 0
+    out = []
+    while pos < len(src):
+        m = _TOKEN.match(src, pos)
+        if not m:
+            raise FormulaSyntaxError(f"Carácter inesperado en {src!r}: {src[pos]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind != "ws":
+            out.append((kind, m.group()))
+    return out
+
+
+# ---------- evaluación (semántica de Excel) ----------
+def _num(v):
+    if v is None:
+        return 0.0  # celda vacía
+    if isinstance(v, bool):
+        return float(v)
+    if isinstance(v, (int, float)):
+        return v
+    try:
+        return float(v)
+    except ValueError:
+        raise FormulaError("#VALUE!")
+
+def _text(v):
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "TRUE" if v else "FALSE"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+def _truth(v):
+    if isinstance(v, str):
+        if v.upper() in ("TRUE", "FALSE"):
+            return v.upper() == "TRUE"
+        raise FormulaError("#VALUE!")
+    return bool(_num(v))
+
+def _cmp_key(v):
+    # Excel ordena números < texto < lógicos; vacío vale 0 o ""
+    if isinstance(v, bool):
+        return (2, v)
+    if isinstance(v, str):
+        return (1, v.lower())
+    return (0, 0.0 if v is None else v)
+
+def _compare(op, a, b):
+    if a is None:
+        a = "" if isinstance(b, str) else 0.0
+    if b is None:
+        b = "" if isinstance(a, str) else 0.0
+    ka, kb = _cmp_key(a), _cmp_key(b)
+    return {"=": ka == kb, "<>": ka != kb, "<": ka < kb,
+            ">": ka > kb, "<=": ka <= kb, ">=": ka >= kb}[op]
+
+def _div(a, b):
+    if b == 0:
+        raise FormulaError("#DIV/0!")
+    return a / b
+
+def _pow(a, b):
+    try:
+        r = a ** b
+    except (ZeroDivisionError, OverflowError):
+        raise FormulaError("#NUM!")
+    if isinstance(r, complex):
+        raise FormulaError("#NUM!")
+    return r
+
+_ARITH = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": _div,
+    "^": _pow,
+}
+
+def _round(x, nd=0):
+    # ROUND de Excel: mitades lejos de cero
+    nd = int(nd)
+    m = 10.0 ** nd
+    return math.copysign(math.floor(abs(x) * m + 0.5) / m, x)
+
+
+# ---------- compilación ----------
+class _Parser:
+    """Descenso recursivo con la precedencia de Excel; genera closures f(vals, ctx)."""
+
+    def __init__(self, src, sheet):
+        self.toks = _tokens(src[1:] if src.startswith("=") else src)
+        self.i = 0
+        self.sheet = sheet
+        self.refs = set()
+
+    def parse(self):
+        fn = self.expr()
+        if self.i != len(self.toks):
+            raise FormulaSyntaxError(f"Sobra {self.toks[self.i][1]!r}")
+        return fn
+
+    def peek(self):
+        return self.toks[self.i] if self.i < len(self.toks) else (None, None)
+
+    def take(self, text=None):
+        kind, tok = self.peek()
+        if kind is None or (text is not None and tok.upper() != text):
+            raise FormulaSyntaxError(f"Se esperaba {text or 'algo'} y llegó {tok!r}")
+        self.i += 1
+        return kind, tok
+
+    def binary(self, ops, sub, build):
+        fn = sub()
+        while self.peek()[0] == "op" and self.peek()[1] in ops:
+            op = self.take()[1]
+            fn = build(op, fn, sub())
+        return fn
+
+    def expr(self):
+        def cmp(op, a, b):
+            return lambda v, c: _compare(op, a(v, c), b(v, c))
+        return self.binary(("=", "<>", "<", ">", "<=", ">="), self.concat, cmp)
+
+    def concat(self):
+        def cat(op, a, b):
+            return lambda v, c: _text(a(v, c)) + _text(b(v, c))
+        return self.binary(("&",), self.additive, cat)
+
+    def additive(self):
+        return self.binary(("+", "-"), self.term, self._arith)
+
+    def term(self):
+        return self.binary(("*", "/"), self.power, self._arith)
+
+    def power(self):
+        return self.binary(("^",), self.unary, self._arith)
+
+    @staticmethod
+    def _arith(op, a, b):
+        f = _ARITH[op]
+        return lambda v, c: f(_num(a(v, c)), _num(b(v, c)))
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            a = self.unary()
+            return lambda v, c: -_num(a(v, c))
+        if self.peek() == ("op", "+"):
+            self.take()
+            return self.unary()
+        fn = self.atom()
+        while self.peek() == ("op", "%"):
+            self.take()
+            fn = (lambda a: lambda v, c: _num(a(v, c)) / 100.0)(fn)
+        return fn
+
+    def atom(self):
+        kind, tok = self.take()
+        if kind == "num":
+            x = float(tok)
+            return lambda v, c: x
+        if kind == "str":
+            s = tok[1:-1].replace('""', '"')
+            return lambda v, c: s
+        if kind == "ref":
+            return self.ref(tok)
+        if kind == "name":
+            up = tok.upper()
+            if self.peek() == ("op", "("):
+                return self.call(up)
+            if up in ("TRUE", "FALSE"):
+                b = up == "TRUE"
+                return lambda v, c: b
+            raise FormulaSyntaxError(f"Nombre no soportado: {tok}")
+        if tok == "(":
+            fn = self.expr()
+            self.take(")")
+            return fn
+        raise FormulaSyntaxError(f"Token inesperado: {tok!r}")
+
+    def _strip(self, tok):
+        if "!" in tok:
+            sh, tok = tok.rsplit("!", 1)
+            sh = sh.strip("'").replace("''", "'")
+            if self.sheet is None or sh.lower() != self.sheet.lower():
+                raise FormulaSyntaxError(f"Referencia a otra hoja: {sh}")
+        return tok.replace("$", "").upper()
+
+    def ref(self, tok):
+        cell = self._strip(tok)
+        if ":" in cell:
+            raise FormulaSyntaxError(f"Rango fuera de VLOOKUP: {cell}")
+        self.refs.add(cell)
+
+        def get(v, c):
+            x = v.get(cell)
+            if isinstance(x, FormulaError):
+                raise x
+            return x
+        return get
+
+    def args(self):
+        self.take("(")
+        out = []
+        if self.peek() != ("op", ")"):
+            while True:
+                kind, tok = self.peek()
+                if kind == "ref" and ":" in tok:
+                    self.take()
+                    rng = self._strip(tok)
+                    out.append(rng)
+                else:
+                    out.append(self.expr())
+                if self.peek() != ("op", ","):
+                    break
+                self.take()
+        self.take(")")
+        return out
+
+    def call(self, name):
+        args = self.args()
+        if any(isinstance(a, str) for a in args) and name != "VLOOKUP":
+            raise FormulaSyntaxError(f"{name} no admite rangos")
+        n = len(args)
+        if name == "IF" and n in (2, 3):
+            cond, yes = args[0], args[1]
+            no = args[2] if n == 3 else (lambda v, c: False)
+            return lambda v, c: yes(v, c) if _truth(cond(v, c)) else no(v, c)
+        if name == "IFERROR" and n == 2:
+            val, alt = args
+
+            def iferror(v, c):
+                try:
+                    return val(v, c)
+                except FormulaError:
+                    return alt(v, c)
+            return iferror
+        if name == "VLOOKUP" and n in (3, 4):
+            return self.vlookup(*args)
+        if name == "NEMA" and n == 1:
+            x = args[0]
+
+            def nema(v, c):
+                a = x(v, c)
+                if a is None or a == "":
+                    return ""
+                r = c.nema.pick(_num(a))
+                return "" if r == BLANK else r
+            return nema
+        if name in ("MIN", "MAX") and n >= 1:
+            agg = min if name == "MIN" else max
+            return lambda v, c: agg(_num(a(v, c)) for a in args)
+        if name == "ROUND" and n in (1, 2):
+            x, nd = args[0], (args[1] if n == 2 else (lambda v, c: 0))
+            return lambda v, c: _round(_num(x(v, c)), _num(nd(v, c)))
+        if name == "ABS" and n == 1:
+            x = args[0]
+            return lambda v, c: abs(_num(x(v, c)))
+        raise FormulaSyntaxError(f"Función no soportada: {name}/{n}")
+
+    def vlookup(self, key, rng, col, approx=None):
+        if not isinstance(rng, str) or rng not in LOOKUP_RANGES:
+            raise FormulaSyntaxError(f"VLOOKUP sobre un rango desconocido: {rng}")
+        if isinstance(key, str) or isinstance(col, str) or isinstance(approx, str):
+            raise FormulaSyntaxError("VLOOKUP: argumentos no válidos")
+        attr = LOOKUP_RANGES[rng]
+
+        def vlookup(v, c):
+            if _num(col(v, c)) != 2:
+                raise FormulaError("#REF!")
+            k = key(v, c)
+            if k is None or k == "":
+                raise FormulaError("#N/A")
+            # FALSO -> el modo elegido por el usuario (exacto por defecto); VERDADERO -> piso
+            exact = approx is not None and not _truth(approx(v, c))
+            r = c.lookup(attr).lookup(_num(k), c.mode if exact else "floor")
+            if r is None:
+                raise FormulaError("#N/A")
+            return r
+        return vlookup
+
+
+def compile_formula(src, sheet=None):
+    """Compila "=..." a (función(vals, ctx), celdas referenciadas)."""
+    p = _Parser(src, sheet)
+    return p.parse(), frozenset(p.refs)
+
+
+class _Ctx:
+    __slots__ = ("tables", "mode", "nema", "_lk")
+
+    def __init__(self, tables, mode):
+        self.tables = tables
+        self.mode = mode
+        self.nema = as_nema_table(tables.nema)
+        self._lk = {}
+
+    def lookup(self, attr):
+        t = self._lk.get(attr)
+        if t is None:
+            t = self._lk[attr] = as_lookup_table(getattr(self.tables, attr))
+        return t
+
+
+def _out(v):
+    # "" y errores quedan en blanco, como en la ventana
+    if v is None or v == "" or isinstance(v, FormulaError):
+        return None
+    return v
+
+
+class FormulaModel:
+    """Cell formulas compiled once and evaluated for any inputs."""
+
+    def __init__(self, formulas=None, values=None, sheet=DEFAULT_SHEET):
+        self.formulas = dict(formulas or {})
+        self.values = dict(values or {})
+        self.sheet = sheet
+        self.warnings = []
+        self.from_workbook = set()  # celdas que usan la fórmula del libro
+        self.effective = {}         # celda -> fórmula en uso
+        self._blue = self._compile(BLUE_CELLS, BLUE_INPUTS)
+        self._orange = self._compile(ORANGE_CELLS, ORANGE_INPUTS)
+
+    @property
+    def source(self):
+        return "libro" if self.from_workbook else "predeterminadas"
+
+    def _compile_cell(self, cell):
+        src = self.formulas.get(cell)
+        if src is not None:
+            try:
+                fn, deps = compile_formula(src, self.sheet)
+                self.effective[cell] = src
+                self.from_workbook.add(cell)
+                return fn, deps
+            except FormulaSyntaxError as e:
+                self.warnings.append(f"{cell}: {e}; se usa {DEFAULT_FORMULAS[cell]}")
+        self.effective[cell] = DEFAULT_FORMULAS[cell]
+        return compile_formula(DEFAULT_FORMULAS[cell], self.sheet)
+
+    def _compile(self, cells, inputs):
+        """Orden topológico de las celdas de salida y sus dependencias."""
+        compiled = {}
+        todo = [c for c in cells.values() if c not in inputs]
+        while todo:
+            cell = todo.pop()
+            if cell in compiled or cell in inputs:
+                continue
+            if cell in DEFAULT_FORMULAS:
+                compiled[cell] = self._compile_cell(cell)
+            elif cell in self.formulas:
+                try:
+                    compiled[cell] = compile_formula(self.formulas[cell], self.sheet)
+                    self.effective[cell] = self.formulas[cell]
+                except FormulaSyntaxError as e:
+                    self.warnings.append(f"{cell}: {e}; se toma como vacía")
+                    compiled[cell] = (lambda v, c: FormulaError("#VALUE!"), frozenset())
+                    continue
+            else:
+                continue  # constante o vacía: se toma de self.values
+            todo.extend(compiled[cell][1])
+
+        order, state = [], {}
+
+        def visit(cell, path):
+            st = state.get(cell)
+            if st == 2 or cell not in compiled:
+                return
+            if st == 1:
+                raise FormulaSyntaxError("Referencia circular: " + " -> ".join(path + [cell]))
+            state[cell] = 1
+            for d in sorted(compiled[cell][1]):
+                visit(d, path + [cell])
+            state[cell] = 2
+            order.append((cell, compiled[cell][0]))
+
+        try:
+            for cell in sorted(compiled):
+                visit(cell, [])
+        except FormulaSyntaxError as e:
+            # un ciclo invalida el bloque: se vuelve a las fórmulas predeterminadas
+            self.warnings.append(f"{e}; bloque con fórmulas predeterminadas")
+            for cell in compiled:
+                self.from_workbook.discard(cell)
+                self.effective.pop(cell, None)
+            self.effective.update((c, DEFAULT_FORMULAS[c]) for c in cells.values() if c not in inputs)
+            return FormulaModel(None, None, self.sheet)._compile(cells, inputs)
+        base = {k: v for k, v in self.values.items() if k not in inputs}
+        return order, base, inputs, cells
+
+    def _eval(self, block, a, b, tables, mode):
+        order, base, inputs, cells = block
+        ctx = _Ctx(tables, mode)
+        vals = dict(base)
+        vals[inputs[0]], vals[inputs[1]] = a, b
+        for cell, fn in order:
+            try:
+                vals[cell] = fn(vals, ctx)
+            except FormulaError as e:
+                vals[cell] = e
+            except (TypeError, OverflowError):
+                vals[cell] = FormulaError("#VALUE!")
+        return vals, cells
+
+    def compute_blue(self, hp, ambient_c, tables, mode="exact") -> BlueResult:
+        """Como engine.compute_blue, con las fórmulas del libro."""
+        vals, cells = self._eval(self._blue, hp, ambient_c, tables, mode)
+        return BlueResult(hp or None, *(_out(vals.get(cells[f])) for f in BlueResult._fields[1:5]),
+                          ambient_c, *(_out(vals.get(cells[f])) for f in BlueResult._fields[6:]))
+
+    def compute_orange(self, hp, fasl, tables, mode="exact") -> OrangeResult:
+        """Como engine.compute_orange, con las fórmulas del libro."""
+        vals, cells = self._eval(self._orange, hp, fasl, tables, mode)
+        return OrangeResult(hp or None, *(_out(vals.get(cells[f])) for f in OrangeResult._fields[1:5]),
+                            fasl, *(_out(vals.get(cells[f])) for f in OrangeResult._fields[6:]))
+
+    def describe(self):
+        """Texto de "Ver fórmulas": la fórmula en uso de cada celda de salida."""
+        lines = []
+        for title, cells, inputs in (("Bloque AZUL", BLUE_CELLS, BLUE_INPUTS),
+                                     ("Bloque NARANJA", ORANGE_CELLS, ORANGE_INPUTS)):
+            lines.append(f"{title}:")
+            for cell in cells.values():
+                if cell in inputs:
+                    continue
+                tag = "" if cell in self.from_workbook else "  (predeterminada)"
+                lines.append(f"  {cell} {self.effective[cell]}{tag}")
+            lines.append("")
+        lines += self.warnings
+        return "\n".join(lines).rstrip()
+
+    def __reduce__(self):
+        # las closures no se serializan: se recompila al deserializar
+        return (FormulaModel, (self.formulas, self.values, self.sheet))
+
+    def __repr__(self):
+        return f"FormulaModel(sheet={self.sheet!r}, source={self.source!r}, warnings={len(self.warnings)})"
+
+
+_default = None
+
+def default_model():
+    """Modelo con DEFAULT_FORMULAS (se compila una vez, en el primer uso)."""
+    global _default
+    if _default is None:
+        _default = FormulaModel()
+    return _default
+
+
+# ---------- verificación ----------
+# Tablas de prueba con la forma de las del libro (A4:B22 y R3:S14)
+_CHECK_BLUE = {float(c): p for c, p in zip(range(10, 95, 5), (116, 113, 111, 108, 106, 103, 100, 96, 92,
+                                                                 87, 82, 77, 72, 70, 68, 65, 61))}
+_CHECK_ORANGE = {3280.0: 100.0, 4920.0: 97.0, 6560.0: 94.0, 8200.0: 91.0, 9840.0: 88.0, 11480.0: 85.0}
+
+def self_check(cases=20000, seed=0):
+    """Comprueba que DEFAULT_FORMULAS den lo mismo que el motor y que los
+    avisos (ciclo, función no soportada) y las fórmulas del libro funcionen.
+
+    Devuelve la lista de fallos (vacía si todo cuadra).
+    """
+    import random
+    import engine
+    from excel_tables import FALLBACK_NEMA, make_snapshot
+
+    tables = make_snapshot(_CHECK_BLUE, _CHECK_ORANGE, FALLBACK_NEMA)
+    rnd = random.Random(seed)
+    model, fails = default_model(), []
+
+    def hp():
+        return rnd.choice((0.0, 0.5, 1.0, 7.5, 10.0, 250.0, 900.0, round(rnd.uniform(0.1, 1000.0), 2)))
+
+    def key(t):
+        ks = list(t)
+        return rnd.choice((None, rnd.choice(ks), rnd.uniform(ks[0] - 10, ks[-1] + 10), ks[0] - 1, ks[-1] + 1))
+
+    # 1. predeterminadas == motor, en los cuatro modos de búsqueda
+    for i in range(cases):
+        mode = engine.LOOKUP_MODES[i % len(engine.LOOKUP_MODES)]
+        h, a, f = hp(), key(_CHECK_BLUE), key(_CHECK_ORANGE)
+        for name, got, exp in (
+                ("blue", model.compute_blue(h, a, tables, mode), engine.compute_blue(h, a, tables, mode)),
+                ("orange", model.compute_orange(h, f, tables, mode), engine.compute_orange(h, f, tables, mode))):
+            if got != exp:
+                fails.append(f"{name} {mode} hp={h} clave={a if name == 'blue' else f}: {got} != {exp}")
+                if len(fails) >= 20:
+                    return fails
+
+    # 2. un ciclo devuelve el bloque a las predeterminadas
+    m = FormulaModel({"Y2": "=AB2/0.94", "AB2": "=Y2*0.94"})
+    if not any("circular" in w for w in m.warnings) or m.from_workbook:
+        fails.append(f"ciclo sin aviso o sin volver a las predeterminadas: {m.warnings}")
+    elif m.compute_blue(10.0, 40.0, tables) != engine.compute_blue(10.0, 40.0, tables):
+        fails.append("ciclo: el bloque no calcula como el motor")
+
+    # 3. una función no soportada avisa y usa la predeterminada de esa celda
+    m = FormulaModel({"I3": "=FOO(I2)"})
+    if not any(w.startswith("I3:") for w in m.warnings) or "I3" in m.from_workbook:
+        fails.append(f"función no soportada sin aviso: {m.warnings}")
+
+    # 4. una fórmula del libro se usa en lugar de la predeterminada
+    m = FormulaModel({"L2": '=IF(I2=0,"",I2*1.2)'})
+    rec = m.compute_blue(10.0, 40.0, tables)
+    if m.source != "libro" or "L2" not in m.from_workbook or rec.l2 != 10.0 * 1.2:
+        fails.append(f"fórmula del libro ignorada: L2={rec.l2}, origen={m.source}")
+    return fails
+
+
+if __name__ == "__main__":
+    import sys
+    problems = self_check()
+    print("\n".join(problems) if problems else "fórmulas predeterminadas == motor; avisos y fórmulas del libro: OK")
+    sys.exit(1 if problems else 0)
+
@@ -0,0 +1,141 @@
+# instrument.py
+# Tramos (perf_counter) y contadores de carga y cálculo; se activa con CM_TRACE=1.
+
+"""Opt-in instrumentation for the load and calculation phases.
+
+Set ``CM_TRACE=1`` to record :func:`span` timings and :func:`count`
+counters (cells read, lookups performed...).  ``CM_TRACE_OUT=ruta.json``
+writes a Chrome trace (``chrome://tracing`` / Perfetto) at exit; any other
+extension gets a plain-text log.
+
+Disabled (the default), :func:`span` hands back one shared no-op context
+manager and :func:`count` returns immediately, so instrumented code runs
+as before.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get("CM_TRACE", "") not in ("", "0")
+OUT = os.environ.get("CM_TRACE_OUT", "")
+MAX_EVENTS = 100000
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("rec", "name", "args", "t0")
+
+    def __init__(self, rec, name, args):
+        self.rec, self.name, self.args = rec, name, args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.rec.add(self.name, self.t0, time.perf_counter(), **self.args)
+        return False
+
+
+class Recorder:
+    """Eventos (nombre, inicio, fin, hilo, args) y contadores acumulados."""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.events = deque(maxlen=max_events)
+        self.counters = {}
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name, t0, t1, **args):
+        self.events.append((name, t0, t1, threading.get_ident(), args))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def since(self, t0):
+        return [e for e in list(self.events) if e[1] >= t0]
+
+    def totals(self, events=None):
+        """{nombre: [veces, total_s, máx_s]} en orden de primera aparición."""
+        out = {}
+        for name, t0, t1, _, _ in (list(self.events) if events is None else events):
+            st = out.setdefault(name, [0, 0.0, 0.0])
+            st[0] += 1
+            st[1] += t1 - t0
+            st[2] = max(st[2], t1 - t0)
+        return out
+
+    def summary(self):
+        lines = [f"{'tramo':<28}{'veces':>7}{'total ms':>12}{'media ms':>11}{'máx ms':>10}"]
+        for name, (n, tot, mx) in self.totals().items():
+            lines.append(f"{name:<28}{n:>7}{tot * 1000:>12.2f}{tot * 1000 / n:>11.3f}{mx * 1000:>10.2f}")
+        if self.counters:
+            lines.append("")
+            lines += [f"{name:<28}{v:>7}" for name, v in self.counters.items()]
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        ev = [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+               "ts": round((t0 - self.origin) * 1e6, 1), "dur": round((t1 - t0) * 1e6, 1),
+               "args": {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                        for k, v in args.items()}}
+              for name, t0, t1, tid, args in list(self.events)]
+        end = round((time.perf_counter() - self.origin) * 1e6, 1)
+        ev += [{"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": end, "args": {"n": v}}
+               for name, v in self.counters.items()]
+        return {"traceEvents": ev, "displayTimeUnit": "ms"}
+
+    def write(self, path):
+        """Chrome trace si la ruta termina en .json; si no, el resumen en texto."""
+        import json
+        with open(path, "w", encoding="utf-8") as f:
+            if str(path).lower().endswith(".json"):
+                json.dump(self.chrome_trace(), f)
+            else:
+                f.write(self.summary() + "\n")
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self.counters.clear()
+
+
+RECORDER = Recorder()
+
+
+def span(name, **args):
+    """``with span("nombre"):`` mide el bloque (no hace nada si CM_TRACE no está activo)."""
+    if not ENABLED:
+        return _NULL
+    return _Span(RECORDER, name, args)
+
+def count(name, n=1):
+    if ENABLED:
+        RECORDER.count(name, n)
+
+def breakdown(t0, names=None):
+    """"tramo 12 ms · tramo 3 ms" de lo registrado desde t0 (para lbl_status)."""
+    tot = RECORDER.totals(RECORDER.since(t0))
+    parts = [f"{n} {s * 1000:.{0 if s >= 0.01 else 2}f} ms" for n, (_, s, _) in tot.items()
+             if names is None or n in names]
+    return " · ".join(parts)
+
+
+if ENABLED and OUT:
+    import atexit
+    atexit.register(RECORDER.write, OUT)
@@ -0,0 +1,115 @@
+# livecalc.py
+# Recálculo incremental de un bloque: I2 -> I3/I4/L2 -> Y2 -> AB2/AE2 -> AH2 como grafo.
+
+"""Incremental evaluation of the blue/orange cell chain.
+
+A :class:`LiveBlock` holds the cells of one block as a small dependency
+graph in topological order.  ``update`` recomputes only the cells
+downstream of what changed and stops propagating as soon as a cell keeps
+its previous value; it returns just the cells whose value moved.  The
+values always match ``engine.compute_blue``/``compute_orange``.
+"""
+
+from engine import (
+    BLANK, F_50HZ, F_EC, BlueResult, OrangeResult,
+    as_lookup_table, as_nema_table, to_kw, to_watts,
+)
+
+_KEEP = object()
+
+
+def _cells(f):
+    """Celdas de un bloque a partir de los nombres de campo del registro.
+
+    Cada celda es (nombre, dependencias, función, usa_tablas).  Si alguna
+    dependencia es None la celda queda en None, salvo I2/Q2 que la manejan.
+    """
+    (i, kw, w, l, ln, q, u, y, ykw, yw, yn, ab, abn, ae, aen, ah, ahn) = f
+
+    def nema(ctx, x):
+        v = ctx.nema.pick(x)
+        return None if v == BLANK else v
+
+    return [
+        (i, ("hp",), lambda ctx, hp: hp or None, False),
+        (kw, (i,), lambda ctx, x: to_kw(x), False),
+        (w, (i,), lambda ctx, x: to_watts(x), False),
+        (l, (i,), lambda ctx, x: x * F_50HZ, False),
+        (ln, (l,), nema, True),
+        (q, ("key",), lambda ctx, k: k, False),
+        (u, ("key",), lambda ctx, k: ctx.pct(k), True),
+        (y, (i, u), lambda ctx, a, b: a / b, False),
+        (ykw, (y,), lambda ctx, x: to_kw(x), False),
+        (yw, (y,), lambda ctx, x: to_watts(x), False),
+        (yn, (y,), nema, True),
+        (ab, (y,), lambda ctx, x: x * F_EC, False),
+        (abn, (ab,), nema, True),
+        (ae, (y,), lambda ctx, x: x * F_50HZ, False),
+        (aen, (ae,), nema, True),
+        (ah, (ae,), lambda ctx, x: x * F_EC, False),
+        (ahn, (ah,), nema, True),
+    ]
+
+
+class LiveBlock:
+    """One block (blue or orange) evaluated cell by cell."""
+
+    def __init__(self, fields, table_attr, tables, mode="exact"):
+        self.fields = fields
+        self.table_attr = table_attr
+        self.cells = _cells(fields)
+        self.values = {"hp": None, "key": None}
+        self.values.update(dict.fromkeys(fields))
+        self.set_tables(tables, mode)
+        self.evaluated = 0  # celdas recalculadas (diagnóstico)
+
+    @classmethod
+    def blue(cls, tables, mode="exact"):
+        return cls(BlueResult._fields, "blue", tables, mode)
+
+    @classmethod
+    def orange(cls, tables, mode="exact"):
+        return cls(OrangeResult._fields, "orange", tables, mode)
+
+    def set_tables(self, tables, mode=None):
+        self.lookup = as_lookup_table(getattr(tables, self.table_attr))
+        self.nema = as_nema_table(tables.nema)
+        if mode is not None:
+            self.mode = mode
+
+    def pct(self, key):
+        pct = self.lookup.lookup(key, self.mode)
+        return None if pct is None else pct / 100.0
+
+    def update(self, hp=_KEEP, key=_KEEP, tables=None, mode=None):
+        """Aplica entradas/tablas nuevas y devuelve {celda: valor} de lo que cambió."""
+        dirty = set()
+        for name, v in (("hp", hp), ("key", key)):
+            if v is not _KEEP and v != self.values[name]:
+                self.values[name] = v
+                dirty.add(name)
+        refresh_tables = tables is not None or (mode is not None and mode != self.mode)
+        if tables is not None:
+            self.set_tables(tables, mode)
+        elif mode is not None:
+            self.mode = mode
+
+        changed = {}
+        vals = self.values
+        for name, deps, fn, uses_tables in self.cells:
+            if not (dirty.intersection(deps) or (refresh_tables and uses_tables)):
+                continue
+            self.evaluated += 1
+            args = [vals[d] for d in deps]
+            if name in (self.fields[0], self.fields[5]):  # I2/Q2 reciben la entrada tal cual
+                new = fn(self, *args)
+            else:
+                new = None if any(a is None for a in args) else fn(self, *args)
+            if new != vals[name]:
+                vals[name] = new
+                dirty.add(name)
+                changed[name] = new
+        return changed
+
+    def result(self):
+        return {f: self.values[f] for f in self.fields}
@@ -0,0 +1,148 @@
+# loadtest.py
+# Prueba de carga del servicio: python loadtest.py --requests 5000 --concurrency 8
+
+"""Load test for ``service.py`` on localhost.
+
+Each worker thread keeps one HTTP/1.1 connection open and sends sizing
+requests for random catalog ratings; latencies are collected per request
+and reported as p50/p90/p99 together with requests per second.  Without
+``--url`` a server (``app.py serve``) is started in a separate process on
+a free port first.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from excel_tables import FALLBACK_NEMA
+
+AMBIENTS = (30, 40, 45, 50, 55, 60)
+ALTITUDES = (1000, 3280, 5000, 6560)
+
+HERE = Path(__file__).resolve().parent
+
+
+def _payload(rng, batch):
+    def row():
+        return {"hp": rng.choice(FALLBACK_NEMA), "ambient_c": rng.choice(AMBIENTS), "fasl": rng.choice(ALTITUDES)}
+    if batch:
+        return "/size/batch", {"rows": [row() for _ in range(batch)]}
+    return "/size", row()
+
+
+def _worker(host, port, n, batch, seed, lat, errors):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        for _ in range(n):
+            path, body = _payload(rng, batch)
+            data = json.dumps(body).encode()
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", path, data, {"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                ok = False
+            lat.append(time.perf_counter() - t0)
+            if not ok:
+                errors.append(1)
+    finally:
+        conn.close()
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, round(p / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+def run(host, port, requests=2000, concurrency=8, batch=0, seed=0):
+    """Lanza la carga y devuelve un dict con latencias (ms) y peticiones por segundo."""
+    lat, errors = [], []
+    per = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        for i, n in enumerate(per):
+            ex.submit(_worker, host, port, n, batch, seed + i, lat, errors)
+    wall = time.perf_counter() - t0
+    lat.sort()
+    ms = [x * 1000.0 for x in lat]
+    return {
+        "requests": len(lat),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "rows_per_request": batch or 1,
+        "seconds": round(wall, 3),
+        "req_per_s": round(len(lat) / wall, 1) if wall else 0.0,
+        "rows_per_s": round(len(lat) * (batch or 1) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(ms[-1], 3) if ms else 0.0,
+    }
+
+
+def _spawn_server(xlsx, sheet):
+    """Arranca ``app.py serve`` en otro proceso (así no comparte el GIL con los clientes)."""
+    p = subprocess.Popen([sys.executable, str(HERE / "app.py"), "serve", "--port", "0", "--poll", "0",
+                          "--xlsx", xlsx, "--sheet", sheet],
+                         stderr=subprocess.PIPE, text=True)
+    line = p.stderr.readline()
+    m = re.search(r"http://([^:/\s]+):(\d+)", line)
+    if not m:
+        p.kill()
+        raise RuntimeError(f"el servicio no arrancó: {line.strip() or p.stderr.read().strip()}")
+    return p, m.group(1), int(m.group(2))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", help="servicio ya en marcha (p. ej. http://127.0.0.1:8765); si falta se arranca uno")
+    ap.add_argument("--xlsx", help="libro para el servidor local (sin --url)")
+    ap.add_argument("--sheet", default="cm electrico")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--batch", type=int, default=0, help="filas por petición a /size/batch (0 = /size)")
+    ap.add_argument("--json", action="store_true", help="imprime el resultado como JSON")
+    args = ap.parse_args(argv)
+
+    server = None
+    if args.url:
+        u = urlsplit(args.url)
+        host, port = u.hostname, u.port or 80
+    else:
+        if not args.xlsx:
+            ap.error("indica --url o --xlsx")
+        server, host, port = _spawn_server(args.xlsx, args.sheet)
+    try:
+        res = run(host, port, args.requests, args.concurrency, args.batch)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(res))
+    else:
+        print(f"{res['requests']} peticiones ({res['errors']} errores), {res['concurrency']} conexiones, "
+              f"{res['rows_per_request']} fila(s) por petición")
+        print(f"  {res['req_per_s']:.0f} pet/s, {res['rows_per_s']:.0f} filas/s")
+        print(f"  p50 {res['p50_ms']:.2f} ms  p90 {res['p90_ms']:.2f} ms  p99 {res['p99_ms']:.2f} ms  máx {res['max_ms']:.2f} ms")
+    return 1 if res["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# registry.py
+# Conjuntos de tablas ya compilados, por (libro, hoja, mtime), con desalojo LRU.
+
+"""In-memory registry of loaded table sets.
+
+``TableRegistry.get(path, sheet)`` returns the compiled
+:class:`excel_tables.TableSnapshot` (or, with ``kind="formulas"``, the
+:class:`formulas.FormulaModel`) for one sheet of one workbook revision.
+Entries are keyed by resolved path, sheet, mtime and size, kept in LRU
+order and evicted once either ``max_entries`` or ``max_bytes`` (an
+estimate of the compiled size) is exceeded, so switching between recent
+workbooks and sheets does not touch the disk again.  A lock makes it safe
+to use from the loader thread and from batch code alike.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+from excel_tables import DEFAULT_SHEET, TableSnapshot, invalidate_cache, load_tables
+from instrument import span
+
+MAX_ENTRIES = 8
+MAX_BYTES = 64 << 20  # 64 MB
+
+
+def _load_formulas(path, sheet, use_cache=True):
+    from formulas import load_model  # diferido: solo si alguien pide fórmulas
+    return load_model(path, sheet, use_cache=use_cache)
+
+def _load_tables(path, sheet, use_cache=True):
+    return load_tables(path, sheet, use_cache=use_cache)
+
+LOADERS = {"tables": _load_tables, "formulas": _load_formulas}
+
+
+def estimate_nbytes(value):
+    """Tamaño aproximado en memoria de un snapshot o un modelo de fórmulas."""
+    if isinstance(value, TableSnapshot):
+        n = sys.getsizeof(value)
+        for t in (value.blue, value.orange):
+            # dict + claves/valores float + los dos array('d')
+            n += sys.getsizeof(t._d) + 48 * len(t) + t.xs.itemsize * len(t.xs) * 2
+        return n + value.nema.steps.itemsize * len(value.nema)
+    formulas = getattr(value, "formulas", None)
+    if formulas is not None:
+        # texto de las fórmulas + ~1 KB por celda compilada (closures)
+        cells = len(getattr(value, "effective", ())) or len(formulas)
+        return (sys.getsizeof(formulas) + sum(len(f) for f in formulas.values())
+                + sys.getsizeof(value.values) + 1024 * cells)
+    return sys.getsizeof(value)
+
+
+class RegistryKey(NamedTuple):
+    path: str
+    sheet: str
+    kind: str
+    mtime_ns: int
+    size: int
+
+
+def _key(path, sheet, kind):
+    p = Path(path).resolve()
+    st = p.stat()  # FileNotFoundError si el libro no existe
+    return RegistryKey(str(p), sheet.lower(), kind, st.st_mtime_ns, st.st_size)
+
+
+class TableRegistry:
+    """LRU of compiled table sets keyed by (path, sheet, kind, mtime, size)."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, loaders=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.loaders = dict(LOADERS if loaders is None else loaders)
+        self._entries = OrderedDict()  # RegistryKey -> (valor, bytes, hoja); el último es el más reciente
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def peek(self, path, sheet=DEFAULT_SHEET, kind="tables"):
+        """El valor si ya está en memoria (y el libro no cambió); None si no. No lee el libro."""
+        try:
+            key = _key(path, sheet, kind)
+        except OSError:
+            return None
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return hit[0]
+
+    def get(self, path, sheet=DEFAULT_SHEET, kind="tables", use_cache=True):
+        """Devuelve ``(valor, origen)``; origen es "memoria", "caché" o "libro".
+
+        ``use_cache=False`` ignora tanto la memoria como la caché en disco.
+        """
+        key = _key(path, sheet, kind)
+        if use_cache:
+            with self._lock:
+                hit = self._entries.get(key)
+                if hit is not None:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return hit[0], "memoria"
+        # la lectura del libro va fuera del candado: otras hojas siguen disponibles
+        with span(f"registro.{kind}", hoja=sheet):
+            value, cached = self.loaders[kind](path, sheet, use_cache=use_cache)
+        self.put(key, value, sheet)
+        return value, ("caché" if cached else "libro")
+
+    def put(self, key, value, sheet=None):
+        size = estimate_nbytes(value)
+        with self._lock:
+            self.stats["misses"] += 1
+            # otra revisión del mismo libro/hoja ya no se puede volver a pedir
+            for k in [k for k in self._entries if k[:3] == key[:3] and k != key]:
+                self._drop(k)
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, sheet or key.sheet)
+            self.nbytes += size
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                              or self.nbytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key):
+        size = self._entries.pop(key)[1]
+        self.nbytes -= size
+
+    def discard(self, path=None, sheet=None, disk=False):
+        """Olvida las entradas de (path, sheet), o todas; ``disk`` también borra la caché JSON."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self.nbytes = 0
+            else:
+                p = str(Path(path).resolve())
+                for k in [k for k in self._entries
+                          if k.path == p and (sheet is None or k.sheet == sheet.lower())]:
+                    self._drop(k)
+        if disk:
+            invalidate_cache(path, sheet)
+
+    def recent(self, kind="tables"):
+        """[(path, sheet)] del más reciente al más antiguo."""
+        with self._lock:
+            return [(k.path, e[2]) for k, e in reversed(self._entries.items()) if k.kind == kind]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f"TableRegistry({len(self)}/{self.max_entries} entradas, "
+                f"{self.nbytes / 1024:.0f}/{self.max_bytes / 1024:.0f} KB, {self.stats})")
+
+
+# Registro compartido del proceso (la ventana y el modo por lotes)
+REGISTRY = TableRegistry()
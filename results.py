@@ -0,0 +1,241 @@
+# results.py
+# Resultados dimensionados en columnas tipadas (array), exportables a CSV, XLSX, Parquet y Arrow.
+
+"""Columnar store for sized motors.
+
+:class:`ResultStore` keeps one ``array`` per output field of
+``engine.BlueResult``/``engine.OrangeResult`` instead of one record (or
+one StringVar) per motor.  Values are float64 (``'d'``); NEMA columns are
+float32 (``'f'``), which holds every NEMA step exactly.  Blank cells are
+``NaN`` and the ">800 HP" overflow is ``inf``, the same convention as
+``batch.size_batch``, so a row costs 8 bytes per value column and 4 per
+NEMA column (about 116 bytes per block) instead of a dict of Python
+floats.  ``fields`` can narrow the store to the columns a report needs.
+
+``store[i]`` returns a small ``__slots__`` record; ``column(name)`` the
+typed array (or a NumPy view with ``numpy=True``).  ``save(path)`` picks
+the format from the extension: ``.csv`` (the window's text, or raw numbers
+with ``text=False``), ``.xlsx`` (openpyxl write-only), ``.parquet`` and
+``.arrow``/``.feather`` (pyarrow, if installed).
+"""
+
+from array import array
+from pathlib import Path
+
+from engine import BLANK, NEMA_FIELDS, PRECISION, BlueResult, OrangeResult, fmt_column
+
+NAN = float("nan")
+INF = float("inf")
+ALL_FIELDS = BlueResult._fields + OrangeResult._fields
+OVERFLOW = ">800 HP"
+
+
+def _encode(v):
+    if v.__class__ is float:
+        return v
+    if v is None or v == BLANK:
+        return NAN
+    if isinstance(v, str):
+        try:
+            return float(v)
+        except ValueError:
+            return INF if v[:1] == ">" else NAN  # ">N HP": desborde NEMA
+    return float(v)
+
+
+# ---------- registros ----------
+class Row:
+    """Un motor del almacén: un atributo por campo (``__slots__``), como los registros del motor."""
+    __slots__ = ()
+
+    def __iter__(self):
+        return (getattr(self, k) for k in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, Row) and self._asdict() == other._asdict()
+
+    def _asdict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):
+        return "Row(" + ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__) + ")"
+
+_ROW_TYPES = {}
+
+def row_type(fields):
+    """Subclase de :class:`Row` con ``__slots__ = fields`` (una por conjunto de campos)."""
+    fields = tuple(fields)
+    t = _ROW_TYPES.get(fields)
+    if t is None:
+        t = _ROW_TYPES[fields] = type("Row", (Row,), {"__slots__": fields})
+    return t
+
+
+# ---------- almacén ----------
+class ResultStore:
+    """Columnas tipadas de resultados; ``extra`` guarda columnas de entrada tal cual (listas)."""
+
+    def __init__(self, fields=ALL_FIELDS, extra=(), overflow=OVERFLOW):
+        self.fields = tuple(fields)
+        self.extra = {k: [] for k in extra if k not in self.fields}
+        self.overflow = overflow
+        self._cols = {k: array("f" if k in NEMA_FIELDS else "d") for k in self.fields}
+        self._row = row_type(self.fields)
+
+    @classmethod
+    def from_records(cls, records, fields=ALL_FIELDS, extra=(), overflow=OVERFLOW):
+        """Desde registros del motor o filas dict (p. ej. ``batch_io.size_rows``)."""
+        store = cls(fields, extra, overflow)
+        store.extend(records)
+        return store
+
+    @classmethod
+    def from_columns(cls, cols, overflow=OVERFLOW):
+        """Desde ``{campo: ndarray}`` de ``batch.size_batch``, sin pasar por objetos Python."""
+        import numpy as np
+        store = cls(tuple(cols), (), overflow)
+        for k, a in cols.items():
+            c = store._cols[k]
+            c.frombytes(np.ascontiguousarray(a, dtype=c.typecode).tobytes())
+        return store
+
+    # ----- escritura -----
+    def append(self, rec):
+        """Agrega un registro (BlueResult/OrangeResult, Row o dict); los campos que falten quedan vacíos."""
+        get = rec.get if isinstance(rec, dict) else (lambda k, d=None: getattr(rec, k, d))
+        for k, c in self._cols.items():
+            v = get(k)
+            if v.__class__ is str and v[:1] == ">":
+                self.overflow = v
+            c.append(_encode(v))
+        for k, vals in self.extra.items():
+            vals.append(get(k))
+
+    def extend(self, records):
+        for rec in records:
+            self.append(rec)
+
+    def clear(self):
+        for c in self._cols.values():
+            del c[:]
+        for vals in self.extra.values():
+            vals.clear()
+
+    # ----- lectura -----
+    def __len__(self):
+        return len(self._cols[self.fields[0]]) if self.fields else 0
+
+    def _decode(self, v):
+        return None if v != v else (self.overflow if v == INF else v)
+
+    def __getitem__(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("índice fuera del almacén")
+        row = self._row.__new__(self._row)
+        for k, c in self._cols.items():
+            setattr(row, k, self._decode(c[i]))
+        return row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def column(self, name, numpy=False):
+        """El array tipado de la columna (``numpy=True``: vista ndarray sin copia)."""
+        c = self._cols[name]
+        if not numpy:
+            return c
+        import numpy as np
+        return np.frombuffer(c, dtype=c.typecode)
+
+    def text_column(self, name):
+        """La columna como la muestra la ventana (``engine.fmt``)."""
+        try:
+            c = self.column(name, numpy=True)
+        except ImportError:
+            c = self._cols[name]
+        return fmt_column(c, PRECISION.get(name, 2), inf=self.overflow if name in NEMA_FIELDS else None)
+
+    @property
+    def nbytes(self):
+        return sum(c.itemsize * len(c) for c in self._cols.values())
+
+    def __repr__(self):
+        return f"ResultStore({len(self)} filas, {len(self.fields)} campos, {self.nbytes / 1024:.0f} KB)"
+
+    # ----- exportación -----
+    def _header(self):
+        return list(self.extra) + list(self.fields)
+
+    def _rows(self, text=True):
+        if text:
+            cols = [self.text_column(k) for k in self.fields]
+        else:
+            cols = [[None if v != v else (self.overflow if v == INF else v) for v in self._cols[k]]
+                    for k in self.fields]
+        return zip(*self.extra.values(), *cols)
+
+    def to_csv(self, path, text=True):
+        """CSV con los textos de la ventana; ``text=False`` escribe los números completos."""
+        import csv
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(self._header())
+            w.writerows(self._rows(text))
+        return len(self)
+
+    def to_xlsx(self, path, sheet="dimensionado"):
+        """XLSX (openpyxl en modo write-only): números como números, celdas vacías en blanco."""
+        try:
+            import openpyxl
+        except Exception:
+            raise RuntimeError("Instala openpyxl: pip install openpyxl")
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(sheet)
+        ws.append(self._header())
+        for vals in self._rows(text=False):
+            ws.append(vals)
+        wb.save(path)
+        return len(self)
+
+    def to_arrow(self):
+        """``pyarrow.Table``; NaN -> null, el desborde NEMA queda como inf (ver metadatos)."""
+        try:
+            import pyarrow as pa
+        except Exception:
+            raise RuntimeError("Instala pyarrow: pip install pyarrow")
+        data = {k: pa.array(vals) for k, vals in self.extra.items()}
+        for k in self.fields:
+            data[k] = pa.array(self.column(k, numpy=True), from_pandas=True)
+        return pa.table(data, metadata={"nema_overflow": self.overflow})
+
+    def to_parquet(self, path):
+        table = self.to_arrow()  # avisa si falta pyarrow
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+        return len(self)
+
+    def to_feather(self, path):
+        table = self.to_arrow()
+        import pyarrow.feather as feather
+        feather.write_feather(table, path)
+        return len(self)
+
+    def save(self, path, text=True):
+        """Exporta según la extensión: .csv, .xlsx, .parquet, .arrow/.feather."""
+        ext = Path(path).suffix.lower()
+        if ext in (".xlsx", ".xlsm"):
+            return self.to_xlsx(path)
+        if ext == ".parquet":
+            return self.to_parquet(path)
+        if ext in (".arrow", ".feather"):
+            return self.to_feather(path)
+        return self.to_csv(path, text)
+
+
+EXPORT_TYPES = (
+    ("CSV", "*.csv"), ("Excel", "*.xlsx"), ("Parquet", "*.parquet"), ("Arrow/Feather", "*.arrow;*.feather"),
+)
@@ -0,0 +1,269 @@
+# service.py
+# Servicio HTTP/JSON local: python app.py serve --port 8765
+
+"""Local HTTP/JSON sizing service.
+
+Endpoints (JSON in, JSON out; blank cells are ``null``, and so are results
+too large to be finite; non-finite numbers in a request are a 400):
+
+``GET /health``
+    Workbook, sheet, table sizes and formula source currently served.
+``GET /size?hp=10&ambient_c=40&fasl=3280`` / ``POST /size``
+    One motor: ``{"hp": 10, "ambient_c": 40, "fasl": 3280}``.
+``POST /size/batch``
+    ``{"rows": [{...}, ...]}``; rows come back in the same order.
+
+Both sizing endpoints accept ``block`` (blue/orange/both/site), ``rule``
+(product/worst, for ``site``), ``lookup`` (exact/floor/nearest/linear)
+and ``sheet``, and go through ``batch_io.size_rows``, i.e. the same
+formulas as the window.  Tables are
+loaded once at startup through ``registry.REGISTRY``; a poller thread
+(``watcher.WorkbookWatcher``) watches the workbook's mtime and size and
+swaps in the reloaded tables, so requests never wait for a parse, and
+``/health`` lists the ranges that changed in the last reload.
+``ThreadingHTTPServer`` serves requests concurrently with keep-alive
+connections.
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from batch_io import BLOCKS, size_rows
+from engine import LOOKUP_MODES, SITE_RULES, ResultCache
+from excel_tables import DEFAULT_SHEET
+from registry import REGISTRY
+from watcher import WorkbookWatcher
+
+MAX_BODY = 32 << 20  # 32 MB por petición
+MAX_ROWS = 100000
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _no_constant(name):
+    # NaN/Infinity no son JSON válido: se eco-arían tal cual en la respuesta
+    raise ValueError(f"{name} no es un número JSON")
+
+def _finite(text):
+    # 1e400 es JSON válido pero Python lo lee como inf
+    x = float(text)
+    if not math.isfinite(x):
+        raise ValueError(f"{text} no es un número finito")
+    return x
+
+def _finite_int(text):
+    n = int(text)
+    try:
+        float(n)
+    except OverflowError:
+        raise ValueError(f"{text[:20]}... no es un número finito")
+    return n
+
+def _json_row(row):
+    # un hp enorme pero finito puede desbordar el cálculo (i4, y2_w...): celda en blanco
+    return {k: None if isinstance(v, float) and not math.isfinite(v) else v for k, v in row.items()}
+
+
+class Books:
+    """Tablas (y modelo de fórmulas) en servicio; se reemplazan de una vez al recargar."""
+
+    def __init__(self, path, sheet=DEFAULT_SHEET, formulas=False):
+        self.path = path
+        self.sheet = sheet
+        self.formulas = formulas
+        self.memo = ResultCache()  # una recarga cambia la versión de las tablas: no hace falta vaciarlo
+        self.current = self._load(sheet)  # (tablas, modelo, mtime_ns)
+        self.watcher = WorkbookWatcher(path, sheet, formulas, tables=self.current[0], model=self.current[1])
+        self.changed = ()  # rangos que cambiaron en la última recarga
+
+    @property
+    def reloads(self):
+        return self.watcher.reloads
+
+    def _load(self, sheet):
+        mtime = Path(self.path).stat().st_mtime_ns
+        tables = REGISTRY.get(self.path, sheet)[0]
+        model = REGISTRY.get(self.path, sheet, "formulas")[0] if self.formulas else None
+        return tables, model, mtime
+
+    def get(self, sheet=None):
+        if sheet is None or sheet.lower() == self.sheet.lower():
+            return self.current
+        return self._load(sheet)  # otra hoja: desde el registro en memoria tras la primera vez
+
+    def poll(self):
+        """Recarga si cambió el libro (watcher.py); devuelve True si recargó."""
+        r = self.watcher.poll()
+        if r is None:
+            return False
+        if r.error is not None:
+            # libro a medio guardar o borrado: se sigue sirviendo la versión anterior y se reintenta
+            print(f"recarga fallida: {r.error}", file=sys.stderr)
+            return False
+        self.current = r.tables, r.model, r.stamp[0]  # asignación atómica: las peticiones ven el viejo o el nuevo
+        self.changed = r.changed
+        return True
+
+    def watch(self, interval, stop):
+        while not stop.wait(interval):
+            if self.poll():
+                what = ", ".join(self.changed) or "sin cambios en las tablas"
+                print(f"tablas recargadas: {self.path} ({what})", file=sys.stderr)
+
+    def health(self):
+        tables, model, mtime = self.current
+        return {
+            "ok": True,
+            "workbook": str(self.path),
+            "sheet": self.sheet,
+            "mtime_ns": mtime,
+            "reloads": self.reloads,
+            "changed": list(self.changed),
+            "tables": {"A4:B22": len(tables.blue), "R3:S14": len(tables.orange), "H3:H30": len(tables.nema)},
+            "formulas": model.source if model is not None else "motor",
+            "memo": self.memo.stats(),
+        }
+
+
+def _options(opts):
+    block = opts.get("block", "both")
+    if block not in BLOCKS:
+        raise BadRequest(f"block debe ser uno de {BLOCKS}")
+    mode = opts.get("lookup", "exact")
+    if mode not in LOOKUP_MODES:
+        raise BadRequest(f"lookup debe ser uno de {LOOKUP_MODES}")
+    rule = opts.get("rule", "product")
+    if rule not in SITE_RULES:
+        raise BadRequest(f"rule debe ser uno de {tuple(SITE_RULES)}")
+    sheet = opts.get("sheet")
+    return block, mode, rule, (str(sheet) if sheet else None)
+
+def size(books, rows, opts):
+    """Dimensiona filas dict con los mismos cálculos que la ventana."""
+    block, mode, rule, sheet = _options(opts)
+    try:
+        tables, model, _ = books.get(sheet)
+    except (OSError, KeyError) as e:
+        raise BadRequest(str(e))
+    return [_json_row(r) for r in size_rows(rows, tables, block, mode=mode, model=model, memo=books.memo, rule=rule)]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # cabeceras y cuerpo van en dos escrituras: sin esto, ~40 ms de ACK diferido
+    server_version = "cm-analisis"
+    books = None  # se asigna en make_server
+    quiet = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send(HTTPStatus.OK, self.books.health())
+        if url.path == "/size":
+            q = dict(parse_qsl(url.query))
+            return self._sizing(lambda: {"rows": size(self.books, [q], q)}, single=True)
+        self._send(HTTPStatus.NOT_FOUND, {"error": f"ruta desconocida: {url.path}"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == "/size":
+            return self._sizing(lambda: self._single(self._body()), single=True)
+        if path == "/size/batch":
+            return self._sizing(lambda: self._batch(self._body()))
+        self._send(HTTPStatus.NOT_FOUND, {"error": f"ruta desconocida: {path}"})
+
+    def _single(self, body):
+        if not isinstance(body, dict):
+            raise BadRequest("se esperaba un objeto JSON")
+        return {"rows": size(self.books, [body], body)}
+
+    def _batch(self, body):
+        rows = body.get("rows") if isinstance(body, dict) else None
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise BadRequest('se esperaba {"rows": [{...}, ...]}')
+        if len(rows) > MAX_ROWS:
+            raise BadRequest(f"máximo {MAX_ROWS} filas por petición")
+        return {"rows": size(self.books, rows, body)}
+
+    def _sizing(self, fn, single=False):
+        try:
+            out = fn()
+        except BadRequest as e:
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except Exception as e:
+            return self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        self._send(HTTPStatus.OK, out["rows"][0] if single else out)
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        if n > MAX_BODY:
+            raise BadRequest("cuerpo demasiado grande")
+        try:
+            return json.loads(self.rfile.read(n) or b"{}", parse_constant=_no_constant,
+                              parse_float=_finite, parse_int=_finite_int)
+        except ValueError as e:
+            raise BadRequest(f"JSON no válido: {e}")
+
+    def _send(self, status, obj):
+        data = json.dumps(obj, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+
+def make_server(books, host="127.0.0.1", port=8765, quiet=True):
+    handler = type("BoundHandler", (Handler,), {"books": books, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None, default_xlsx=None):
+    ap = argparse.ArgumentParser(prog="app.py serve", description="Servicio HTTP/JSON de dimensionamiento.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--xlsx", default=default_xlsx, help="libro con las tablas (A4:B22, R3:S14, H3:H30)")
+    ap.add_argument("--sheet", default=DEFAULT_SHEET)
+    ap.add_argument("--formulas", action="store_true", help="evaluar las fórmulas de la hoja")
+    ap.add_argument("--poll", type=float, default=2.0, help="segundos entre revisiones del libro, mtime y tamaño (0 = sin recarga)")
+    ap.add_argument("--verbose", action="store_true", help="registrar cada petición")
+    args = ap.parse_args(argv)
+
+    try:
+        books = Books(args.xlsx, args.sheet, args.formulas)
+    except Exception as e:
+        ap.exit(1, f"No se pudo cargar: {e}\n")
+
+    server = make_server(books, args.host, args.port, quiet=not args.verbose)
+    stop = threading.Event()
+    if args.poll > 0:
+        threading.Thread(target=books.watch, args=(args.poll, stop), daemon=True).start()
+    host, port = server.server_address[:2]
+    print(f"Sirviendo en http://{host}:{port} ({Path(args.xlsx).name} · {args.sheet})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
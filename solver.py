@@ -0,0 +1,170 @@
+# solver.py
+# Dimensionamiento inverso: HP base máximo que cabe en cada paso NEMA (H3:H30) por condición.
+
+"""Inverse sizing: the largest base HP that still fits a NEMA step.
+
+Every stage of the blue/orange blocks is the base HP times a constant for
+a given load fraction ``u`` (A4:B22 / R3:S14 divided by 100)::
+
+    L  = HP * 1.15          Y  = HP / u          AB = Y * 0.94
+    AE = Y * 1.15           AH = AE * 0.94
+
+so the threshold for step ``S`` is ``S`` divided by that constant.  The
+closed form is then nudged by a few ulps until it agrees with the engine's
+own floating-point arithmetic, so ``frame()`` and ``engine.compute_blue``
+never disagree at a boundary.
+
+:class:`SizingGrid` precomputes those thresholds for every key of both
+tables, every NEMA step and every stage when the tables load.  A reverse
+query (``max_hp``) is then an index lookup, and a forward "which frame"
+query (``frame``/``frames``) a ``bisect`` over 28 thresholds.  The grid
+follows the engine's fixed formulas, not a workbook's own (formulas.py).
+"""
+
+import argparse
+import math
+import sys
+from array import array
+from bisect import bisect_left
+
+from engine import BLANK, F_50HZ, F_EC, LOOKUP_MODES, as_lookup_table, as_nema_table
+from excel_tables import DEFAULT_SHEET
+
+# etapa -> (celdas, valor en función de (hp, u)) con las mismas operaciones que engine._derate
+STAGES = {
+    "l":  ("L2/L8",   lambda hp, u: hp * F_50HZ),
+    "y":  ("Y2/Y8",   lambda hp, u: hp / u),
+    "ab": ("AB2/AB8", lambda hp, u: hp / u * F_EC),
+    "ae": ("AE2/AE8", lambda hp, u: hp / u * F_50HZ),
+    "ah": ("AH2/AH8", lambda hp, u: hp / u * F_50HZ * F_EC),
+}
+DEFAULT_STAGE = "ah"  # la más exigente después de Y: 50 Hz + tolerancia EC
+BLOCK_TABLE = {"blue": "blue", "orange": "orange"}
+MAX_ROWS = 256  # umbrales memorizados para claves fuera de la tabla (modos floor/nearest/linear)
+
+
+def max_hp_for(step, u, stage=DEFAULT_STAGE):
+    """Mayor HP (float) cuyo valor en ``stage`` no pasa de ``step``; None si u no es positiva."""
+    if u is None or not u > 0 or not step > 0:
+        return None
+    value = STAGES[stage][1]
+    hp = step / value(1.0, u)  # forma cerrada: paso / factor de la etapa
+    # la forma cerrada puede quedar a un ulp de distancia del cálculo del motor
+    while hp > 0 and value(hp, u) > step:
+        hp = math.nextafter(hp, 0.0)
+    while value(math.nextafter(hp, math.inf), u) <= step:
+        hp = math.nextafter(hp, math.inf)
+    return hp
+
+
+class SizingGrid:
+    """Umbrales {bloque: {clave: {etapa: array('d') por paso NEMA}}} para unas tablas."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.nema = as_nema_table(tables.nema)
+        self.steps = tuple(self.nema.steps)
+        self.overflow = self.nema.overflow
+        self._lookup = {b: as_lookup_table(getattr(tables, t)) for b, t in BLOCK_TABLE.items()}
+        self.grid = {b: {k: self._thresholds(pct / 100.0) for k, pct in lt.items()}
+                     for b, lt in self._lookup.items()}
+        self._l = self._thresholds(1.0)["l"]  # L2/L8 no depende de la condición
+        self._extra = {}
+
+    def _thresholds(self, u):
+        if u is None or not u > 0:
+            return None
+        return {st: array("d", (max_hp_for(s, u, st) for s in self.steps)) for st in STAGES}
+
+    def _row(self, block, key, mode="exact"):
+        if key is None or key != key:
+            return None
+        row = self.grid[block].get(key)
+        if row is not None or mode == "exact":
+            return row
+        pct = self._lookup[block].lookup(key, mode)
+        if pct is None:
+            return None
+        u = pct / 100.0
+        row = self._extra.get(u)
+        if row is None:
+            if len(self._extra) >= MAX_ROWS:
+                self._extra.clear()
+            row = self._extra[u] = self._thresholds(u)
+        return row
+
+    def max_hp(self, block, key, step, stage=DEFAULT_STAGE, mode="exact"):
+        """HP base máximo para que ``stage`` quepa en ``step`` con la condición ``key``; None si no aplica."""
+        i = bisect_left(self.steps, step)
+        if i == len(self.steps) or self.steps[i] != step:
+            raise ValueError(f"{step} no es un paso NEMA de H3:H30")
+        th = self._stage(block, key, stage, mode)
+        return None if th is None else th[i]
+
+    def _stage(self, block, key, stage, mode):
+        if stage == "l":
+            return self._l
+        row = self._row(block, key, mode)
+        return None if row is None else row[stage]
+
+    def frame(self, block, hp, key, stage=DEFAULT_STAGE, mode="exact"):
+        """Paso NEMA de ``stage`` para (hp, key): lo mismo que la celda del motor, con bisect."""
+        if hp is None or hp <= 0:
+            return BLANK
+        th = self._stage(block, key, stage, mode)
+        if th is None:
+            return None
+        i = bisect_left(th, hp)
+        return self.steps[i] if i < len(th) else self.overflow
+
+    def frames(self, block, hps, keys, stage=DEFAULT_STAGE, mode="exact"):
+        return [self.frame(block, hp, k, stage, mode) for hp, k in zip(hps, keys)]
+
+    def rows(self, block, stage=DEFAULT_STAGE):
+        """[(clave, [HP máx por paso])] en orden de clave, para mostrar o exportar."""
+        return [(k, list(r[stage]) if r is not None else [None] * len(self.steps))
+                for k, r in sorted(self.grid[block].items())]
+
+    def describe(self, block, stage=DEFAULT_STAGE, width=9):
+        """Tabla de texto: una fila por clave, una columna por paso NEMA."""
+        head = "clave".rjust(8) + "".join(f"{s:g}".rjust(width) for s in self.steps)
+        lines = [head]
+        for k, vals in self.rows(block, stage):
+            lines.append(f"{k:g}".rjust(8) + "".join(
+                ("-" if v is None else f"{v:.2f}").rjust(width) for v in vals))
+        return "\n".join(lines)
+
+
+# ---------- CLI ----------
+def main(argv=None, default_xlsx=None):
+    ap = argparse.ArgumentParser(prog="app.py solve", description="HP base máximo por paso NEMA y condición.")
+    ap.add_argument("--xlsx", default=default_xlsx, help="libro con las tablas (A4:B22, R3:S14, H3:H30)")
+    ap.add_argument("--sheet", default=DEFAULT_SHEET)
+    ap.add_argument("--block", choices=tuple(BLOCK_TABLE), default="blue")
+    ap.add_argument("--stage", choices=tuple(STAGES), default=DEFAULT_STAGE)
+    ap.add_argument("--key", type=float, help="ambiente °C (blue) o FASL/MASL (orange); sin él, la tabla entera")
+    ap.add_argument("--step", type=float, help="paso NEMA; sin él, todos")
+    ap.add_argument("--lookup", choices=LOOKUP_MODES, default="exact")
+    args = ap.parse_args(argv)
+
+    from registry import REGISTRY
+    try:
+        tables, _ = REGISTRY.get(args.xlsx, args.sheet)
+    except Exception as e:
+        ap.exit(1, f"No se pudo cargar: {e}\n")
+    grid = SizingGrid(tables)
+    if args.key is None:
+        print(grid.describe(args.block, args.stage))
+        return 0
+    steps = [args.step] if args.step is not None else grid.steps
+    for s in steps:
+        try:
+            hp = grid.max_hp(args.block, args.key, s, args.stage, args.lookup)
+        except ValueError as e:
+            ap.exit(2, f"{e}\n")
+        print(f"{s:g}\t{'-' if hp is None else f'{hp:.4f}'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
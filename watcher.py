@@ -0,0 +1,162 @@
+# watcher.py
+# Vigila el libro (mtime y tamaño) y recarga A4:B22, R3:S14 y H3:H30 cuando cambia.
+
+"""Workbook change watcher.
+
+:class:`WorkbookWatcher` polls ``os.stat`` of one workbook.  A new
+(mtime, size) stamp is acted upon only once it has been seen twice in a
+row, so a save still in progress is not parsed; a read that still fails
+is retried, and reported only once the same stamp has stayed unreadable
+for ``SETTLE_S``.  The reload goes through
+``registry.REGISTRY`` (the new mtime is a new key, and ``load_tables``
+streams only the bounding box of the three ranges) and comes back as one
+:class:`Reload`: the new snapshot, the formula model if asked for, and
+which ranges differ from the previous load.  Callers swap it in with a
+single assignment, so readers see either the old tables or the new ones.
+The read itself runs outside the watcher's lock, so :meth:`rebase` never
+waits on it; a reload that started before a ``rebase()`` is dropped.
+
+``poll()`` does one check in the caller's thread (batch runs call it
+between rows, gated by ``due()``); ``start(callback)`` polls from a daemon thread and calls
+``callback`` there, so GUI code must hand the result to its own thread.
+Polling rather than inotify: one ``stat`` every couple of seconds is
+negligible, and it behaves the same on network shares and on Windows,
+where the shared workbook usually lives.
+"""
+
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from excel_tables import DEFAULT_SHEET, RANGES, changed_ranges
+from registry import REGISTRY
+
+INTERVAL_S = 2.0
+SETTLE_S = 2.0  # un guardado en curso puede quedarse quieto un rato entre dos escrituras
+_NEVER = object()  # ningún error avisado todavía
+
+
+class Reload(NamedTuple):
+    tables: object           # excel_tables.TableSnapshot (la anterior si falló)
+    model: object            # formulas.FormulaModel o None
+    changed: tuple           # ("A4:B22", "H3:H30", "fórmulas"...) respecto a la carga anterior
+    stamp: tuple             # (mtime_ns, tamaño) del libro leído
+    error: Optional[Exception] = None
+
+
+def file_stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class WorkbookWatcher:
+    """Revisa un libro/hoja y lo recarga cuando cambia; ``tables``/``model`` son la última carga."""
+
+    def __init__(self, path, sheet=DEFAULT_SHEET, formulas=False, interval=INTERVAL_S,
+                 tables=None, model=None):
+        self.path = path
+        self.sheet = sheet
+        self.formulas = formulas
+        self.interval = interval
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next = time.monotonic() + interval
+        self._gen = 0  # sube con cada rebase(): una carga empezada antes se descarta
+        self.rebase(tables, model)
+
+    def rebase(self, tables=None, model=None):
+        """El libro se acaba de cargar por otro camino: esa versión pasa a ser la vigente."""
+        with self._lock:
+            try:
+                self.stamp = file_stamp(self.path)
+            except OSError:
+                self.stamp = None
+            self.tables, self.model = tables, model
+            self._gen += 1
+            self._pending = None   # sello visto una vez, a la espera de que se repita
+            self._failed = (_NEVER, 0.0)  # (sello que falló, desde cuándo): se reintenta antes de avisar
+            self._reported = _NEVER  # sello del último error avisado (un aviso por versión)
+
+    def poll(self):
+        """Una revisión: None si no hay nada nuevo; si no, un :class:`Reload`."""
+        with self._lock:
+            try:
+                now = file_stamp(self.path)
+            except OSError as e:
+                return self._fail(None, e)  # borrado o renombrado a medio guardar: se reintenta
+            if now == self.stamp:
+                self._pending = None
+                return None
+            if now != self._pending:
+                self._pending = now  # todavía puede estar escribiéndose
+                return None
+            gen = self._gen
+        # la lectura tarda (segundos con fórmulas): sin el candado, rebase() no espera
+        try:
+            tables = REGISTRY.get(self.path, self.sheet)[0]
+            model = self._load_model() if self.formulas else None
+            err = None
+        except Exception as e:
+            err = e
+        with self._lock:
+            if gen != self._gen:
+                return None  # se recargó por otro camino mientras tanto
+            if err is not None:
+                return self._fail(now, err)
+            changed = changed_ranges(self.tables, tables) if self.tables is not None else tuple(RANGES.values())
+            if model is not None and self.model is not None and model.formulas != self.model.formulas:
+                changed += ("fórmulas",)
+            self.stamp, self.tables, self.model = now, tables, model
+            self._pending, self._failed, self._reported = None, (_NEVER, 0.0), _NEVER
+            self.reloads += 1
+            return Reload(tables, model, changed, now)
+
+    def due(self):
+        """True si ya pasó ``interval`` desde la última vez (para llamar a poll() desde un bucle)."""
+        t = time.monotonic()
+        if t < self._next:
+            return False
+        self._next = t + self.interval
+        return True
+
+    def _load_model(self):
+        try:
+            return REGISTRY.get(self.path, self.sheet, "formulas")[0]
+        except Exception:
+            from formulas import default_model  # sin fórmulas legibles: las predeterminadas
+            return default_model()
+
+    def _fail(self, now, err):
+        # se sigue con la versión anterior; solo se avisa (una vez) si el mismo sello
+        # sigue sin poder leerse pasados SETTLE_S: antes puede ser un guardado a medias
+        t = time.monotonic()
+        if now != self._failed[0]:
+            self._failed = (now, t)
+            return None
+        if t - self._failed[1] < max(SETTLE_S, self.interval) or now == self._reported:
+            return None
+        self._reported = now
+        return Reload(self.tables, self.model, (), now, err)
+
+    # ----- hilo -----
+    def start(self, callback):
+        """Revisa cada ``interval`` s en un hilo demonio; ``callback(reload)`` corre en ese hilo."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self, callback):
+        while not self._stop.wait(self.interval):
+            r = self.poll()
+            if r is not None:
+                callback(r)
+
+    def stop(self):
+        self._stop.set()
+
+    def __repr__(self):
+        return f"WorkbookWatcher({self.path!r}, {self.sheet!r}, cada {self.interval:g} s, {self.reloads} recargas)"